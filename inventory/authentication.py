@@ -0,0 +1,171 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .cache import bump_generation, get_cache, get_generation
+
+DEFAULTS = {
+    'TTL': 30,
+    'MAX_ENTRIES': 10000,
+    'SHARED': False,
+}
+
+
+def auth_cache_setting(name):
+    return getattr(settings, 'AUTH_USER_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def user_scope(user_id):
+    return f"auth-user:{user_id}"
+
+
+# AUTHENTICATED USER CACHE
+# Users (with their profile) are kept pickled in a small per-process LRU for a
+# few seconds, keyed by user id and token jti. With SHARED on they are also put
+# in the inventory cache, whose per-user generation lets a save in one process
+# invalidate the copies held by the others. Every hit returns a fresh copy, so
+# requests never share a user instance.
+class UserCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generations = {}
+
+    # Taken before the user is loaded, a save that lands in between makes the result unstorable
+    def generation(self, user_id):
+        with self._lock:
+            local = self._generations.get(user_id, 0)
+        shared = get_generation(user_scope(user_id)) if auth_cache_setting('SHARED') else None
+        return local, shared
+
+    def get(self, user_id, jti):
+        generation = self.generation(user_id)
+        key = (user_id, jti)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, entry_generation, payload = entry
+                if expires > time.monotonic() and entry_generation == generation:
+                    self._entries.move_to_end(key)
+                    return pickle.loads(payload)
+                del self._entries[key]
+
+        if generation[1] is not None:
+            payload = get_cache().get(self.shared_key(user_id, jti, generation[1]))
+            if payload is not None:
+                self._store(key, generation, payload)
+                return pickle.loads(payload)
+        return None
+
+    def set(self, user_id, jti, user, generation):
+        if generation != self.generation(user_id):
+            return
+        payload = pickle.dumps(user)
+        self._store((user_id, jti), generation, payload)
+        if generation[1] is not None:
+            get_cache().set(self.shared_key(user_id, jti, generation[1]), payload, auth_cache_setting('TTL'))
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+        if auth_cache_setting('SHARED'):
+            bump_generation(user_scope(user_id))
+
+    def shared_key(self, user_id, jti, generation):
+        return f"inventory:{user_scope(user_id)}:{generation}:{jti}"
+
+    def _store(self, key, generation, payload):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + auth_cache_setting('TTL'), generation, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > auth_cache_setting('MAX_ENTRIES'):
+                self._entries.popitem(last=False)
+
+
+user_cache = UserCache()
+
+
+# Drop the cached user now, and again once the surrounding transaction commits so
+# a request reading the old row in the meantime can't put it back
+def invalidate_user(user_id, using='default'):
+    user_cache.invalidate(user_id)
+    transaction.on_commit(lambda: user_cache.invalidate(user_id), using=using)
+
+
+# JWT AUTHENTICATION WITH CACHED USER RESOLUTION
+# Same checks as JWTAuthentication, but the user and profile come from the cache
+# and are only loaded (in one query) on a miss.
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+
+        user = user_cache.get(user_id, jti)
+        if user is None:
+            generation = user_cache.generation(user_id)
+            try:
+                # From the primary, a replica could still return the user as it was before a save
+                user = (
+                    self.user_model.objects.using(DEFAULT_DB_ALIAS)
+                    .select_related('profile')
+                    .get(**{api_settings.USER_ID_FIELD: user_id})
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            user_cache.set(user_id, jti, user, generation)
+
+        self.check_user(user, validated_token)
+        return user
+
+    def check_user(self, user, validated_token):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+
+# CLAIMS-ONLY AUTHENTICATION (opt-in with TOKEN_CLAIMS_AUTH)
+# For read-only views that only need the user id: request.user becomes a TokenUser
+# built from the token claims (user_id, is_staff) and nothing is loaded. Views
+# using it must filter on request.user.pk, not on the user instance.
+class TokenClaimsAuthMixin:
+    def get_authenticators(self):
+        if getattr(settings, 'TOKEN_CLAIMS_AUTH', False):
+            return [JWTStatelessUserAuthentication()]
+        return super().get_authenticators()
+
+
+# Authentication for plain async Django views, which have no DRF request cycle.
+# Returns None when the request isn't authenticated.
+async def authenticate_request(request, allow_query_token=False):
+    if getattr(settings, 'TOKEN_CLAIMS_AUTH', False):
+        authentication = JWTStatelessUserAuthentication()
+    else:
+        authentication = CachedJWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is None and allow_query_token:
+        raw_token = request.GET.get('token')
+    if not raw_token:
+        return None
+    try:
+        token = authentication.get_validated_token(raw_token)
+        # A cache miss loads the user from the database
+        return await sync_to_async(authentication.get_user)(token)
+    except (AuthenticationFailed, InvalidToken):
+        return None
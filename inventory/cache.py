@@ -0,0 +1,107 @@
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from .routers import pin_to_primary
+
+# Scope shared by every tenant, categories are not owned by a user
+GLOBAL_SCOPE = 'global'
+
+
+def get_cache():
+    return caches[getattr(settings, 'INVENTORY_CACHE_ALIAS', 'default')]
+
+
+def generation_key(scope):
+    return f"inventory:gen:{scope}"
+
+
+# Every cached payload embeds its scope's generation in the key. Bumping the
+# generation makes all of them unreachable at once, they then simply expire.
+def get_generation(scope):
+    cache = get_cache()
+    generation = cache.get(generation_key(scope))
+    if generation is None:
+        cache.add(generation_key(scope), 1, timeout=None)
+        generation = cache.get(generation_key(scope), 1)
+    return generation
+
+
+def bump_generation(scope):
+    cache = get_cache()
+    try:
+        cache.incr(generation_key(scope))
+    except ValueError:
+        cache.add(generation_key(scope), 2, timeout=None)
+
+
+# Invalidate now, and again once the surrounding transaction commits so a read
+# racing the write can't cache the old rows under the new generation.
+def invalidate(scope, using='default'):
+    bump_generation(scope)
+    transaction.on_commit(lambda: bump_generation(scope), using=using)
+
+
+# HIT / MISS METRICS (per process, per view)
+class CacheMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def record(self, view_name, hit):
+        with self._lock:
+            self._counts[(view_name, 'hits' if hit else 'misses')] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        views = {}
+        for (view_name, kind), value in counts.items():
+            views.setdefault(view_name, {'hits': 0, 'misses': 0})[kind] = value
+        for stats in views.values():
+            total = stats['hits'] + stats['misses']
+            stats['hit_ratio'] = round(stats['hits'] / total, 4) if total else 0.0
+        return views
+
+
+metrics = CacheMetrics()
+
+
+# READ-THROUGH CACHE FOR GET ENDPOINTS
+# Caches the serialized payload of successful GETs per tenant. Set cache_scope
+# to GLOBAL_SCOPE for data that is shared by all users.
+class TenantCacheMixin:
+    cache_scope = None
+    cache_timeout = None
+
+    def get_cache_scope(self, request):
+        return self.cache_scope or request.user.pk
+
+    def get_cache_key(self, request, scope):
+        return f"inventory:{scope}:{get_generation(scope)}:{type(self).__name__}:{request.build_absolute_uri()}"
+
+    def get(self, request, *args, **kwargs):
+        cache = get_cache()
+        key = self.get_cache_key(request, self.get_cache_scope(request))
+        view_name = type(self).__name__
+
+        data = cache.get(key)
+        if data is not None:
+            metrics.record(view_name, hit=True)
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        metrics.record(view_name, hit=False)
+        # What is cached must not come from a replica that hasn't caught up yet
+        pin_to_primary()
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            timeout = self.cache_timeout or getattr(settings, 'INVENTORY_CACHE_TIMEOUT', 300)
+            cache.set(key, response.data, timeout)
+        response['X-Cache'] = 'MISS'
+        return response
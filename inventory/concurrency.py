@@ -0,0 +1,27 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, connections
+
+
+# CONCURRENT QUERIES FOR ASYNC VIEWS
+# Django's async ORM methods (aget, acount, ...) all run on one thread with one
+# connection, so awaiting several of them with gather still runs them one after
+# the other. Here every function gets a worker thread and that thread's own
+# connection, so independent queries of a request really overlap. The thread's
+# connection is closed (returned to the pool with DB_POOL) when the function is
+# done, so the executor threads don't each keep a connection open between requests.
+def _on_own_connection(function):
+    def run():
+        close_old_connections()
+        try:
+            return function()
+        finally:
+            connections.close_all()
+    return run
+
+
+async def gather_queries(*functions):
+    return await asyncio.gather(
+        *(sync_to_async(_on_own_connection(function), thread_sensitive=False)() for function in functions)
+    )
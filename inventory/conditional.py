@@ -0,0 +1,76 @@
+import hashlib
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+# HTTP dates have whole seconds, the comparison with If-(Un)Modified-Since must too
+def http_timestamp(last_modified):
+    return int(last_modified.timestamp()) if last_modified is not None else None
+
+
+# CONDITIONAL REQUESTS (ETag / Last-Modified)
+# Validators come from one aggregate over the rows behind the response:
+# max(updated_at) plus the row count, which also changes when rows are deleted.
+class ConditionalRequestMixin:
+    validator_field = 'updated_at'
+
+    def get_validator_queryset(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            return self.get_queryset().filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return self.filter_queryset(self.get_queryset())
+
+    # Detail and update endpoints of the same object must produce the same ETag
+    def get_validator_key(self, request):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            return self.kwargs[lookup_url_kwarg]
+        return request.get_full_path()
+
+    def get_validators(self, request, queryset=None):
+        if queryset is None:
+            queryset = self.get_validator_queryset()
+        state = queryset.aggregate(last_modified=Max(self.validator_field), count=Count('pk'))
+        source = f"{queryset.model._meta.label}:{self.get_validator_key(request)}:{state['last_modified']}:{state['count']}"
+        etag = f'"{hashlib.md5(source.encode(), usedforsecurity=False).hexdigest()}"'
+        return etag, state['last_modified']
+
+    def set_validators(self, response, etag, last_modified):
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(http_timestamp(last_modified))
+        return response
+
+
+# Answers If-None-Match / If-Modified-Since with 304 before anything is serialized
+class ConditionalGetMixin(ConditionalRequestMixin):
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        conditional = get_conditional_response(request, etag=etag, last_modified=http_timestamp(last_modified))
+        if conditional is not None:
+            return conditional
+        return self.set_validators(super().get(request, *args, **kwargs), etag, last_modified)
+
+
+# Rejects PUT/PATCH with 412 when If-Match / If-Unmodified-Since no longer match,
+# so a client can't overwrite changes it hasn't seen
+class ConditionalUpdateMixin(ConditionalRequestMixin):
+    def update(self, request, *args, **kwargs):
+        if 'HTTP_IF_MATCH' not in request.META and 'HTTP_IF_UNMODIFIED_SINCE' not in request.META:
+            response = super().update(request, *args, **kwargs)
+            return self.set_validators(response, *self.get_validators(request))
+
+        queryset = self.get_validator_queryset()
+        with transaction.atomic(using=queryset.db):
+            # Hold the row until the update is written, a concurrent writer waits and then fails the check
+            list(queryset.select_for_update().values_list('pk', flat=True))
+            etag, last_modified = self.get_validators(request, queryset)
+            conditional = get_conditional_response(request, etag=etag, last_modified=http_timestamp(last_modified))
+            if conditional is not None:
+                return conditional
+            response = super().update(request, *args, **kwargs)
+        return self.set_validators(response, *self.get_validators(request))
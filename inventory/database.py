@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+DEFAULTS = {
+    'ALIASES': [],
+    'MAX_LAG': 2,
+    'LAG_CHECK_INTERVAL': 5,
+}
+
+# Seconds the replica is behind. 0 when it has replayed everything it received,
+# since the last replay timestamp also ages while the primary is idle.
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def replicas_setting(name):
+    return getattr(settings, 'DATABASE_REPLICAS', {}).get(name, DEFAULTS[name])
+
+
+# DATABASE CONNECTION METRICS (per process)
+# New connections per alias against requests served. With persistent connections
+# or the pool, connections opened per request should stay well below 1.
+class ConnectionMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._opened = Counter()
+        self._requests = 0
+
+    def record_connection(self, alias):
+        with self._lock:
+            self._opened[alias] += 1
+
+    def record_request(self):
+        with self._lock:
+            self._requests += 1
+
+    def snapshot(self):
+        with self._lock:
+            opened = dict(self._opened)
+            requests = self._requests
+
+        aliases = {}
+        for alias in connections:
+            connection = connections[alias]
+            settings_dict = connection.settings_dict
+            # Only set on Postgres with OPTIONS['pool'] (psycopg 3)
+            pool = getattr(connection, 'pool', None)
+            if pool is not None:
+                mode = 'pool'
+            elif settings_dict['CONN_MAX_AGE'] is None or settings_dict['CONN_MAX_AGE'] > 0:
+                mode = 'persistent'
+            else:
+                mode = 'per-request'
+
+            stats = {
+                'mode': mode,
+                'conn_max_age': settings_dict['CONN_MAX_AGE'],
+                'health_checks': settings_dict['CONN_HEALTH_CHECKS'],
+                'connections_opened': opened.get(alias, 0),
+                'connections_per_request': round(opened.get(alias, 0) / requests, 4) if requests else 0.0,
+            }
+            if pool is not None:
+                stats['pool'] = pool.get_stats()
+            if alias in replicas_setting('ALIASES'):
+                stats['replica_lag'] = replica_monitor.last_lag(alias)
+            aliases[alias] = stats
+        return {'requests': requests, 'databases': aliases}
+
+
+connection_metrics = ConnectionMetrics()
+
+
+# REPLICA LAG (per process)
+# Each replica's lag is measured at most once per LAG_CHECK_INTERVAL. A replica
+# that can't be reached counts as unavailable until the next check.
+class ReplicaMonitor:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checks = {}
+
+    def available(self):
+        return [
+            alias for alias in replicas_setting('ALIASES')
+            if (lag := self.lag(alias)) is not None and lag <= replicas_setting('MAX_LAG')
+        ]
+
+    def lag(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            check = self._checks.get(alias)
+        if check is not None and now - check[0] < replicas_setting('LAG_CHECK_INTERVAL'):
+            return check[1]
+        lag = self._measure(alias)
+        with self._lock:
+            self._checks[alias] = (now, lag)
+        return lag
+
+    def last_lag(self, alias):
+        with self._lock:
+            check = self._checks.get(alias)
+        return check[1] if check is not None else None
+
+    def _measure(self, alias):
+        connection = connections[alias]
+        try:
+            if connection.vendor != 'postgresql':
+                connection.ensure_connection()
+                return 0.0
+            with connection.cursor() as cursor:
+                cursor.execute(LAG_SQL)
+                return float(cursor.fetchone()[0])
+        except DatabaseError:
+            return None
+
+
+replica_monitor = ReplicaMonitor()
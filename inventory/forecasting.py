@@ -0,0 +1,118 @@
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate
+from .models import InventoryItem, StockMovementRollup
+from .rollups import bucket_start
+from .summary import apply_summary_delta
+
+# DEMAND FORECAST FOR A USER'S ITEMS (all of them, or the given page)
+# Daily SALE totals come from the rollups, one row per item and day that had
+# sales. Every statistic is summed per item with np.bincount over those rows
+# only, so memory follows the number of sale days rather than items x days.
+def forecast_demand(user_id, history_days=90, window_days=28, alpha=0.3, lead_time_days=7,
+                    service_level_z=1.65, using='default', items=None):
+    rollups = StockMovementRollup.objects.using(using).filter(user_id=user_id, item__isnull=False)
+    if items is None:
+        items = (
+            InventoryItem.objects.using(using)
+            .filter(user_id=user_id)
+            .order_by('id')
+            .only('id', 'name', 'quantity', 'low_stock_threshold')
+        )
+    else:
+        items = list(items)
+        rollups = rollups.filter(item__in=[item.pk for item in items])
+    items = list(items)
+    if not items:
+        return []
+
+    index = {item.pk: position for position, item in enumerate(items)}
+    first_day = bucket_start(timezone.now(), 'DAY') - timedelta(days=history_days - 1)
+
+    sales = (
+        rollups.filter(change_type='SALE', granularity='DAY', bucket_start__gte=first_day)
+        .values_list('item_id', 'bucket_start', 'quantity')
+    )
+    # Skips items added since the item list was read
+    rows = [row for row in sales if row[0] in index]
+    item_index = np.fromiter((index[item_id] for item_id, _, _ in rows), dtype=np.intp, count=len(rows))
+    day_index = np.fromiter(((day - first_day).days for _, day, _ in rows), dtype=np.intp, count=len(rows))
+    units = np.fromiter((quantity for _, _, quantity in rows), dtype=np.float64, count=len(rows))
+
+    def per_item(weights, mask=slice(None)):
+        return np.bincount(item_index[mask], weights=weights[mask], minlength=len(items))
+
+    units_sold = per_item(units)
+
+    # Days without sales count as zeros in the window's mean and deviation
+    window_length = min(window_days, history_days)
+    in_window = day_index >= history_days - window_length
+    moving_average = per_item(units, in_window) / window_length
+    mean_square = per_item(units ** 2, in_window) / window_length
+    deviation = np.sqrt(np.maximum(mean_square - moving_average ** 2, 0))
+
+    # Exponentially weighted average, the most recent day weighs the most
+    weights = alpha * (1 - alpha) ** np.arange(history_days - 1, -1, -1, dtype=np.float64)
+    ewma = per_item(units * weights[day_index]) / weights.sum()
+
+    quantities = np.array([item.quantity for item in items], dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_of_cover = np.where(ewma > 0, quantities / ewma, np.inf)
+    reorder_point = np.ceil(ewma * lead_time_days + service_level_z * deviation * math.sqrt(lead_time_days))
+
+    return [
+        {
+            "item": item.pk,
+            "name": item.name,
+            "quantity": item.quantity,
+            "low_stock_threshold": item.low_stock_threshold,
+            "units_sold": int(units_sold[position]),
+            "average_daily_demand": round(float(moving_average[position]), 3),
+            "ewma_daily_demand": round(float(ewma[position]), 3),
+            "days_of_cover": None if math.isinf(days_of_cover[position]) else round(float(days_of_cover[position]), 1),
+            # No sales in the history is no demand signal, the current threshold stays
+            "suggested_reorder_point": (
+                int(reorder_point[position]) if units_sold[position] else item.low_stock_threshold
+            ),
+        }
+        for position, item in enumerate(items)
+    ]
+
+
+# Write the suggested reorder points to low_stock_threshold in bulk
+def apply_reorder_points(user_id, forecast, using='default'):
+    now = timezone.now()
+    # Items without sales in the history keep their threshold, 0 would silence their low-stock alerts
+    thresholds = {
+        row['item']: row['suggested_reorder_point']
+        for row in forecast
+        if row['units_sold'] and row['suggested_reorder_point'] != row['low_stock_threshold']
+    }
+    with transaction.atomic(using=using):
+        # Locked in id order and read here, so the low-stock flags compared are the ones being replaced
+        current = (
+            InventoryItem.objects.using(using)
+            .filter(user_id=user_id, pk__in=thresholds)
+            .select_for_update()
+            .order_by('pk')
+            .values_list('pk', 'category_id', 'quantity', 'low_stock_threshold')
+        )
+        changed = []
+        low_stock_deltas = defaultdict(int)
+        for pk, category_id, quantity, threshold in current:
+            changed.append(InventoryItem(pk=pk, low_stock_threshold=thresholds[pk], updated_at=now))
+            low_stock_deltas[category_id] += int(quantity <= thresholds[pk]) - int(quantity <= threshold)
+
+        InventoryItem.objects.using(using).bulk_update(changed, ['low_stock_threshold', 'updated_at'], batch_size=1000)
+        # bulk_update sends no signals. A threshold only moves the low-stock counts.
+        for category_id in sorted(low_stock_deltas):
+            apply_summary_delta(user_id, category_id, {'low_stock_count': low_stock_deltas[category_id]}, using=using)
+        if changed:
+            invalidate(user_id, using=using)
+    return len(changed)
@@ -0,0 +1,193 @@
+import codecs
+import csv
+import json
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+
+from .cache import invalidate
+from .models import Category, InventoryChange, InventoryItem, Supplier
+from .notifications import dispatcher
+from .rollups import record_new_item_movements
+from .serializers import InventoryImportRowSerializer
+from .summary import COUNTERS, apply_summary_delta, item_contribution
+
+FORMATS = {
+    'csv': 'csv',
+    'ndjson': 'ndjson',
+    'jsonl': 'ndjson',
+}
+CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 1000
+
+
+def import_format(filename, requested=None):
+    if requested:
+        return FORMATS.get(requested.lower())
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return FORMATS.get(extension)
+
+
+# Yields (row, error) pairs from a binary stream of CSV or NDJSON lines.
+# Empty CSV cells are dropped so optional columns fall back to their defaults.
+def read_rows(stream, file_format):
+    lines = codecs.iterdecode(stream, 'utf-8-sig')
+    if file_format == 'csv':
+        for row in csv.DictReader(lines):
+            yield {
+                key.strip(): value.strip()
+                for key, value in row.items()
+                if key and isinstance(value, str) and value.strip()
+            }, None
+        return
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield None, {"non_field_errors": [f"Invalid JSON: {exc}"]}
+            continue
+        if not isinstance(row, dict):
+            yield None, {"non_field_errors": ["Each line must be a JSON object."]}
+            continue
+        yield row, None
+
+
+# INVENTORY IMPORT
+# Rows are validated and written in chunks. Categories, suppliers and barcodes
+# are looked up in maps loaded once, and each chunk is written with a few
+# bulk INSERTs instead of one save (and its signals) per item.
+def import_inventory(user, rows, using='default', dry_run=False, chunk_size=CHUNK_SIZE):
+    categories = dict(Category.objects.using(using).values_list('name', 'id'))
+    suppliers = dict(Supplier.objects.using(using).filter(user=user).values_list('name', 'id'))
+    barcodes = set(
+        InventoryItem.objects.using(using)
+        .filter(user=user, barcode__isnull=False)
+        .values_list('barcode', flat=True)
+    )
+
+    result = {"created": 0, "failed": 0, "low_stock": 0, "errors": []}
+
+    def reject(number, errors):
+        result['failed'] += 1
+        if len(result['errors']) < MAX_REPORTED_ERRORS:
+            result['errors'].append({"row": number, "errors": errors})
+
+    chunk = []
+    for number, (row, error) in enumerate(rows, start=1):
+        if error is not None:
+            reject(number, error)
+            continue
+
+        serializer = InventoryImportRowSerializer(data=row)
+        if not serializer.is_valid():
+            reject(number, serializer.errors)
+            continue
+        data = serializer.validated_data
+
+        errors = {}
+        category_id = categories.get(data['category'])
+        if category_id is None:
+            errors['category'] = [f"Unknown category '{data['category']}'."]
+        supplier_id = None
+        if data.get('supplier'):
+            supplier_id = suppliers.get(data['supplier'])
+            if supplier_id is None:
+                errors['supplier'] = [f"Unknown supplier '{data['supplier']}'."]
+        barcode = data.get('barcode') or None
+        if barcode is not None and barcode in barcodes:
+            errors['barcode'] = [f"Barcode '{barcode}' is already used by another item."]
+        if errors:
+            reject(number, errors)
+            continue
+
+        if barcode is not None:
+            barcodes.add(barcode)
+        chunk.append((number, InventoryItem(
+            user=user,
+            name=data['name'],
+            description=data.get('description', ''),
+            category_id=category_id,
+            supplier_id=supplier_id,
+            quantity=data.get('quantity', 0),
+            price=data['price'],
+            low_stock_threshold=data.get('low_stock_threshold', 10),
+            barcode=barcode,
+        )))
+        if len(chunk) >= chunk_size:
+            _load_chunk(user, chunk, result, reject, using, dry_run)
+            chunk = []
+
+    if chunk:
+        _load_chunk(user, chunk, result, reject, using, dry_run)
+
+    if result['created'] and not dry_run:
+        invalidate(user.pk, using=using)
+        # One notification for the whole import instead of one per item
+        message = f"Imported {result['created']} inventory items."
+        if result['low_stock']:
+            message += f" {result['low_stock']} of them are low in stock."
+        dispatcher.dispatch([(user.pk, message, None)], using=using)
+    return result
+
+
+# chunk is a list of (row number, item). A chunk is written in one transaction. When
+# it hits a constraint, e.g. a barcode taken by a concurrent import after the chunk
+# was checked, its rows are written one at a time so only the conflicting ones fail.
+def _load_chunk(user, chunk, result, reject, using, dry_run):
+    items = [item for _, item in chunk]
+    if dry_run:
+        _count(items, result)
+        return
+
+    try:
+        _write_items(user, items, using)
+    except IntegrityError:
+        for number, item in chunk:
+            try:
+                _write_items(user, [item], using)
+            except IntegrityError:
+                if item.barcode is not None:
+                    reject(number, {"barcode": [f"Barcode '{item.barcode}' is already used by another item."]})
+                else:
+                    reject(number, {"non_field_errors": ["The row conflicts with data written during the import."]})
+            else:
+                _count([item], result)
+    else:
+        _count(items, result)
+
+
+def _count(items, result):
+    result['created'] += len(items)
+    result['low_stock'] += sum(1 for item in items if item.is_low_stock)
+
+
+def _write_items(user, items, using):
+    changes = [
+        InventoryChange(
+            item=item,
+            user=user,
+            change_type='RESTOCK',
+            quantity_change=item.quantity,
+            previous_quantity=0,
+            new_quantity=item.quantity,
+            reason='Initial stock entry',
+        )
+        for item in items
+        if item.quantity > 0
+    ]
+    totals = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for item in items:
+        for name, value in item_contribution(item).items():
+            totals[item.category_id][name] += value
+
+    # bulk_create sends no signals, the initial changes, rollups and summaries are written here
+    with transaction.atomic(using=using):
+        InventoryItem.objects.using(using).bulk_create(items, batch_size=1000)
+        InventoryChange.objects.using(using).bulk_create(changes, batch_size=1000)
+        record_new_item_movements(changes, using=using)
+        for category_id, delta in totals.items():
+            apply_summary_delta(user.pk, category_id, delta, using=using)
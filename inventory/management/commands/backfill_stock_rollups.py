@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from inventory.rollups import backfill_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the hourly and daily stock movement rollups from the inventory change log."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users', help="Only this user id (repeatable).")
+        parser.add_argument('--database', default='default', help="Database alias to use.")
+
+    def handle(self, *args, users=None, database='default', **options):
+        created = backfill_rollups(users, using=database)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {created} rollup row(s)."))
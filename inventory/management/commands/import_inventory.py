@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.importer import CHUNK_SIZE, import_format, import_inventory, read_rows
+from inventory.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Import inventory items for one user from a CSV or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or NDJSON file to import.")
+        parser.add_argument('--user', required=True, help="Id of the user the items belong to.")
+        parser.add_argument('--format', dest='file_format', help="csv or ndjson, taken from the file extension by default.")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Only validate the file.")
+        parser.add_argument('--database', default='default', help="Database alias to use.")
+
+    def handle(self, *args, path, user, file_format=None, chunk_size=CHUNK_SIZE, dry_run=False, database='default', **options):
+        owner = CustomUser.objects.using(database).filter(pk=user).first()
+        if owner is None:
+            raise CommandError(f"User {user} does not exist.")
+        file_format = import_format(path, file_format)
+        if file_format is None:
+            raise CommandError("Unknown file format, use --format csv or --format ndjson.")
+
+        with open(path, 'rb') as stream:
+            result = import_inventory(owner, read_rows(stream, file_format), using=database, dry_run=dry_run, chunk_size=chunk_size)
+
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        verb = "Validated" if dry_run else "Imported"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {result['created']} item(s), {result['failed']} row(s) failed."))
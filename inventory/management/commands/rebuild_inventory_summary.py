@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.summary import rebuild_summaries, verify_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user and per-category inventory summaries from the item table, or verify them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users', help="Only this user id (repeatable).")
+        parser.add_argument('--verify', action='store_true', help="Compare the stored summaries instead of rebuilding them.")
+        parser.add_argument('--database', default='default', help="Database alias to use.")
+
+    def handle(self, *args, users=None, verify=False, database='default', **options):
+        if verify:
+            mismatches = verify_summaries(users, using=database)
+            for mismatch in mismatches:
+                self.stdout.write(
+                    f"{mismatch['kind']} {mismatch['key']}: expected {mismatch['expected']}, stored {mismatch['stored']}"
+                )
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} summary row(s) out of date, run without --verify to rebuild.")
+            self.stdout.write(self.style.SUCCESS("Inventory summaries are up to date."))
+            return
+
+        user_count, category_count = rebuild_summaries(users, using=database)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {user_count} user summary row(s) and {category_count} category summary row(s)."
+        ))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from inventory.forecasting import apply_reorder_points, forecast_demand
+
+
+class Command(BaseCommand):
+    help = "Forecast demand from the daily sale rollups and set low_stock_threshold to the suggested reorder point."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users', required=True, help="User id to update (repeatable).")
+        parser.add_argument('--history-days', type=int, default=90)
+        parser.add_argument('--window-days', type=int, default=28)
+        parser.add_argument('--alpha', type=float, default=0.3)
+        parser.add_argument('--lead-time-days', type=int, default=7)
+        parser.add_argument('--service-level-z', type=float, default=1.65)
+        parser.add_argument('--apply', action='store_true', help="Write the thresholds, otherwise only report them.")
+        parser.add_argument('--database', default='default', help="Database alias to use.")
+
+    def handle(self, *args, users, apply=False, database='default', **options):
+        parameters = {
+            'history_days': options['history_days'],
+            'window_days': options['window_days'],
+            'alpha': options['alpha'],
+            'lead_time_days': options['lead_time_days'],
+            'service_level_z': options['service_level_z'],
+        }
+        for user_id in users:
+            forecast = forecast_demand(user_id, using=database, **parameters)
+            if apply:
+                updated = apply_reorder_points(user_id, forecast, using=database)
+                self.stdout.write(self.style.SUCCESS(f"User {user_id}: updated {updated} of {len(forecast)} item(s)."))
+                continue
+            for row in forecast:
+                if row['suggested_reorder_point'] != row['low_stock_threshold']:
+                    self.stdout.write(
+                        f"User {user_id}: {row['name']} {row['low_stock_threshold']} -> {row['suggested_reorder_point']}"
+                    )
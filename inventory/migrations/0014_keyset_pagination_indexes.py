@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0013_alter_inventoryitem_user"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="inventorychange",
+            index=models.Index(
+                fields=["user", "-change_date", "-id"], name="change_user_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="inventoryitem",
+            index=models.Index(
+                fields=["user", "-updated_at", "-id"], name="item_user_updated_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="supplier",
+            index=models.Index(
+                fields=["user", "-updated_at", "-id"], name="supplier_user_updated_idx"
+            ),
+        ),
+    ]
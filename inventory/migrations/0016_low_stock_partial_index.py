@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0015_access_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="inventoryitem",
+            index=models.Index(
+                condition=models.Q(("quantity__lte", models.F("low_stock_threshold"))),
+                fields=["user", "-updated_at", "-id"],
+                name="item_user_low_stock_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:58
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_unread_notifications(apps, schema_editor):
+    Notification = apps.get_model("inventory", "Notification")
+    Profile = apps.get_model("inventory", "Profile")
+    unread = (
+        Notification.objects.filter(user_id=OuterRef("user_id"), is_read=False)
+        .values("user_id")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    Profile.objects.update(unread_notifications=Coalesce(Subquery(unread), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0016_low_stock_partial_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="unread_notifications",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_unread_notifications, migrations.RunPython.noop),
+    ]
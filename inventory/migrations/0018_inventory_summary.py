@@ -0,0 +1,120 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+
+
+def build_summaries(apps, schema_editor):
+    InventoryItem = apps.get_model("inventory", "InventoryItem")
+    InventorySummary = apps.get_model("inventory", "InventorySummary")
+    CategorySummary = apps.get_model("inventory", "CategorySummary")
+
+    aggregates = {
+        "item_count": Count("id"),
+        "total_quantity": Sum("quantity"),
+        "total_value": Sum(
+            ExpressionWrapper(
+                F("quantity") * F("price"),
+                output_field=DecimalField(max_digits=20, decimal_places=2),
+            )
+        ),
+        "low_stock_count": Count("id", filter=Q(quantity__lte=F("low_stock_threshold"))),
+    }
+    items = InventoryItem.objects.order_by()
+    InventorySummary.objects.bulk_create(
+        [InventorySummary(**row) for row in items.values("user_id").annotate(**aggregates)],
+        batch_size=1000,
+    )
+    CategorySummary.objects.bulk_create(
+        [
+            CategorySummary(**row)
+            for row in items.values("user_id", "category_id").annotate(**aggregates)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0017_profile_unread_notifications"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InventorySummary",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="inventory_summary",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("item_count", models.IntegerField(default=0)),
+                ("total_quantity", models.BigIntegerField(default=0)),
+                (
+                    "total_value",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=20),
+                ),
+                ("low_stock_count", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name_plural": "Inventory summaries",
+            },
+        ),
+        migrations.CreateModel(
+            name="CategorySummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("item_count", models.IntegerField(default=0)),
+                ("total_quantity", models.BigIntegerField(default=0)),
+                (
+                    "total_value",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=20),
+                ),
+                ("low_stock_count", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "category",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="summaries",
+                        to="inventory.category",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="category_summaries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Category summaries",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "category"),
+                        name="unique_category_summary_per_user",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
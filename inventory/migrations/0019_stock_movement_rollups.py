@@ -0,0 +1,82 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0018_inventory_summary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockMovementRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("change_type", models.CharField(max_length=20)),
+                (
+                    "granularity",
+                    models.CharField(
+                        choices=[("HOUR", "Hour"), ("DAY", "Day")], max_length=4
+                    ),
+                ),
+                ("bucket_start", models.DateTimeField()),
+                ("quantity", models.BigIntegerField(default=0)),
+                ("change_count", models.IntegerField(default=0)),
+                (
+                    "item",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="movement_rollups",
+                        to="inventory.inventoryitem",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_movement_rollups",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["bucket_start"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "granularity", "change_type", "bucket_start"],
+                        name="rollup_user_bucket_idx",
+                    ),
+                    models.Index(
+                        fields=["item", "granularity", "change_type", "bucket_start"],
+                        name="rollup_item_bucket_idx",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("item__isnull", False)),
+                        fields=("item", "change_type", "granularity", "bucket_start"),
+                        name="unique_item_movement_bucket",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("item__isnull", True)),
+                        fields=("user", "change_type", "granularity", "bucket_start"),
+                        name="unique_user_movement_bucket",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:11
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+# GIN indexes only exist on Postgres, other databases (SQLite in development,
+# LocalSearchBackend) keep them in the model state without creating them
+class PostgresAddIndex(migrations.AddIndex):
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0019_stock_movement_rollups"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        PostgresAddIndex(
+            model_name="inventorychange",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.search.SearchVector("reason", config="english"),
+                name="change_reason_search_idx",
+            ),
+        ),
+        PostgresAddIndex(
+            model_name="inventoryitem",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.search.SearchVector(
+                    "name", "description", config="english"
+                ),
+                name="item_search_idx",
+            ),
+        ),
+        PostgresAddIndex(
+            model_name="inventoryitem",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["name"], name="item_name_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+        PostgresAddIndex(
+            model_name="inventoryitem",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["barcode"],
+                name="item_barcode_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        PostgresAddIndex(
+            model_name="supplier",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.search.SearchVector(
+                    "name", "contact_person", config="english"
+                ),
+                name="supplier_search_idx",
+            ),
+        ),
+        PostgresAddIndex(
+            model_name="supplier",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["name"],
+                name="supplier_name_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        PostgresAddIndex(
+            model_name="supplier",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["email"],
+                name="supplier_email_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-17 01:41
+
+from importlib import import_module
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+# Postgres-only, like the search indexes of 0020
+PostgresAddIndex = import_module("inventory.migrations.0020_search_indexes").PostgresAddIndex
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0020_search_indexes"),
+    ]
+
+    operations = [
+        PostgresAddIndex(
+            model_name="category",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["name"], name="category_name_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+        PostgresAddIndex(
+            model_name="supplier",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["phone_number"],
+                name="supplier_phone_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+    ]
@@ -1,6 +1,11 @@
 import shortuuid
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import models, router, transaction
+
+# TEXT SEARCH CONFIGURATION OF THE SEARCH INDEXES (see inventory/search.py)
+SEARCH_CONFIG = 'english'
 
 # FUNCTION TO GENERATE SHORTUUID
 def generate_shortuuid():
@@ -44,6 +49,8 @@ class Profile(models.Model):
     about = models.TextField(blank=True)
     logo = models.ImageField(upload_to='company_logos/', blank=True, null=True)
     date_of_establishment = models.DateField(blank=True, null=True)
+    # Kept up to date as notifications are written, read or deleted
+    unread_notifications = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -65,6 +72,10 @@ class Category(models.Model):
     
     class Meta:
         verbose_name_plural = "Categories"
+        indexes = [
+            # ?search= fuzzy (pg_trgm) matches of an item's category
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='category_name_trgm_idx'),
+        ]
 
 # STRETCH GOAL
 # SUPPLIER MODEL
@@ -85,7 +96,28 @@ class Supplier(models.Model):
 
     def __str__(self):
         return self.name
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of a user's suppliers
+            models.Index(fields=['user', '-updated_at', '-id'], name='supplier_user_updated_idx'),
+            # ?search= full-text and fuzzy (pg_trgm) matches
+            GinIndex(SearchVector('name', 'contact_person', config=SEARCH_CONFIG), name='supplier_search_idx'),
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='supplier_name_trgm_idx'),
+            GinIndex(fields=['email'], opclasses=['gin_trgm_ops'], name='supplier_email_trgm_idx'),
+            GinIndex(fields=['phone_number'], opclasses=['gin_trgm_ops'], name='supplier_phone_trgm_idx'),
+        ]
    
+# AN ITEM IS LOW IN STOCK ONCE ITS QUANTITY DROPS TO ITS THRESHOLD
+LOW_STOCK = models.Q(quantity__lte=models.F('low_stock_threshold'))
+
+
+class InventoryItemQuerySet(models.QuerySet):
+    # Served by the partial item_user_low_stock_idx index, which has the same predicate
+    def low_stock(self):
+        return self.filter(LOW_STOCK)
+
+
 # INVENTORY ITEM MODEL LINKED TO CATEGORY AND SUPPLIER MODEL
 class InventoryItem(models.Model):
     id = models.CharField(primary_key=True, default=generate_shortuuid, max_length=22, editable=False, unique=True)
@@ -103,25 +135,43 @@ class InventoryItem(models.Model):
     barcode = models.CharField(max_length=100, blank=True, null=True)
     supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, blank=True, null=True, related_name='supplied_items')
 
+    objects = InventoryItemQuerySet.as_manager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['user', 'barcode'], name='unique_barcode_per_user')
         ]
+        indexes = [
+            # Keyset pagination of a user's items
+            models.Index(fields=['user', '-updated_at', '-id'], name='item_user_updated_idx'),
+            # Only the rows that are low in stock, so low-stock lookups never scan the whole catalog
+            models.Index(fields=['user', '-updated_at', '-id'], condition=LOW_STOCK, name='item_user_low_stock_idx'),
+            # ?search= full-text and fuzzy (pg_trgm) matches
+            GinIndex(SearchVector('name', 'description', config=SEARCH_CONFIG), name='item_search_idx'),
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='item_name_trgm_idx'),
+            GinIndex(fields=['barcode'], opclasses=['gin_trgm_ops'], name='item_barcode_trgm_idx'),
+        ]
         ordering = ['-updated_at']
 
     def __str__(self):
         return f"{self.name} ({self.quantity})"
+
+    # The row and the summary deltas written by its signals commit together
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            return super().delete(*args, **kwargs)
     
     # Property to check if the item is low in stock
     @property
     def is_low_stock(self):
         return self.quantity <= self.low_stock_threshold
     
-    # Properties to get total products and total value for dashboard
-    @property
-    def total_products(self):
-        return self.inventory_items.count()
-
     # Total value of inventory
     @property
     def total_value(self):
@@ -129,6 +179,80 @@ class InventoryItem(models.Model):
             return self.quantity * self.price
         return 0 
 
+# DASHBOARD TOTALS PER USER, KEPT UP TO DATE BY DELTA (see inventory/summary.py)
+class InventorySummary(models.Model):
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='inventory_summary')
+    item_count = models.IntegerField(default=0)
+    total_quantity = models.BigIntegerField(default=0)
+    total_value = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    low_stock_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Inventory summaries"
+
+    def __str__(self):
+        return f"Inventory summary for {self.user}"
+
+
+# THE SAME TOTALS PER USER AND CATEGORY
+class CategorySummary(models.Model):
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='category_summaries')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='summaries')
+    item_count = models.IntegerField(default=0)
+    total_quantity = models.BigIntegerField(default=0)
+    total_value = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    low_stock_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category'], name='unique_category_summary_per_user')
+        ]
+        verbose_name_plural = "Category summaries"
+
+    def __str__(self):
+        return f"{self.category} summary for {self.user}"
+
+
+# HOURLY / DAILY STOCK MOVEMENT TOTALS PER ITEM AND CHANGE TYPE (see inventory/rollups.py)
+# Rows without an item hold the totals of all the user's items.
+class StockMovementRollup(models.Model):
+    GRANULARITY = [
+        ('HOUR', 'Hour'),
+        ('DAY', 'Day'),
+    ]
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='stock_movement_rollups')
+    item = models.ForeignKey('InventoryItem', on_delete=models.CASCADE, related_name='movement_rollups', null=True, blank=True)
+    change_type = models.CharField(max_length=20)
+    granularity = models.CharField(max_length=4, choices=GRANULARITY)
+    bucket_start = models.DateTimeField()
+    quantity = models.BigIntegerField(default=0)
+    change_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['item', 'change_type', 'granularity', 'bucket_start'],
+                condition=models.Q(item__isnull=False),
+                name='unique_item_movement_bucket',
+            ),
+            models.UniqueConstraint(
+                fields=['user', 'change_type', 'granularity', 'bucket_start'],
+                condition=models.Q(item__isnull=True),
+                name='unique_user_movement_bucket',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'granularity', 'change_type', 'bucket_start'], name='rollup_user_bucket_idx'),
+            models.Index(fields=['item', 'granularity', 'change_type', 'bucket_start'], name='rollup_item_bucket_idx'),
+        ]
+        ordering = ['bucket_start']
+
+    def __str__(self):
+        return f"{self.change_type} {self.granularity.lower()} of {self.bucket_start:%Y-%m-%d %H:00} ({self.quantity})"
+
+
 # INSTEAD OF EMAIL NOTIFICATION, I WILL CREATE A NOTIFICATION MODEL
 class Notification(models.Model):
     id = models.CharField(primary_key=True, default=generate_shortuuid, max_length=22, editable=False, unique=True)
@@ -140,6 +264,14 @@ class Notification(models.Model):
     def __str__(self):
         return f"Notification for {self.user.email} - {'Read' if self.is_read else 'Unread'}"   
 
+    class Meta:
+        indexes = [
+            # A user's notification feed, newest first
+            models.Index(fields=['user', '-created_at'], name='notif_user_created_idx'),
+            # Only unread rows, for unread counts and badges
+            models.Index(fields=['user', '-created_at'], condition=models.Q(is_read=False), name='notif_user_unread_idx'),
+        ]
+
 
 #  INVENTORY CHANGE LOG MODEL
 class InventoryChange(models.Model):
@@ -163,48 +295,44 @@ class InventoryChange(models.Model):
         return f"{self.change_type} - {self.item.name} ({self.quantity_change})"
     
     def save(self, *args, **kwargs):
-    # Prevent circular quantity updates
-        if self.item:
-            if not (self.reason == 'Initial stock entry' and self.change_type == 'RESTOCK'):
-                self.previous_quantity = self.item.quantity
+        # Only a newly recorded change moves stock, re-saving an old entry must not
+        if not self._state.adding or not self.item_id:
+            return super().save(*args, **kwargs)
 
-                if self.change_type in ['SALE', 'DAMAGE']:
-                    self.new_quantity = self.previous_quantity - self.quantity_change
-                else:  # RESTOCK or RETURN
-                    self.new_quantity = self.previous_quantity + self.quantity_change
+        from .notifications import change_notifications, dispatcher
+        from .rollups import record_movements
+        from .services import apply_stock_delta, publish_stock_level, stock_delta
+        from .summary import apply_stock_movement
 
-                # Update the inventory item
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            # Prevent circular quantity updates
+            if not (self.reason == 'Initial stock entry' and self.change_type == 'RESTOCK'):
+                delta = stock_delta(self.change_type, self.quantity_change)
+                self.new_quantity = apply_stock_delta(self.item_id, delta, using=using)
+                self.previous_quantity = self.new_quantity - delta
                 self.item.quantity = self.new_quantity
-                self.item.save()
+                publish_stock_level(self.item.user_id, self.item, self.new_quantity, using=using)
+                apply_stock_movement(self.item, self.previous_quantity, self.new_quantity, using=using)
             else:
                 # For initial stock, just log the current state
                 self.previous_quantity = 0
                 self.new_quantity = self.item.quantity
 
-            if self.change_type == 'SALE':
-                msg = f"Sale recorded: {self.item.name} — {self.quantity_change} unit(s) sold. Updated stock level: {self.new_quantity}."
-            elif self.change_type == 'RESTOCK':
-                msg = f"Restock completed: {self.quantity_change} unit(s) of {self.item.name} added to inventory. Current stock: {self.new_quantity}."
-            elif self.change_type == 'RETURN':
-                msg = f"Return processed: {self.quantity_change} unit(s) of {self.item.name} returned to inventory. New stock level: {self.new_quantity}."
-            elif self.change_type == 'DAMAGE':
-                msg = f"Damage reported: {self.quantity_change} unit(s) of {self.item.name} marked as damaged. Remaining stock: {self.new_quantity}."
+            super().save(*args, **kwargs)
+            record_movements([self], using=using)
 
-            Notification.objects.create(user=self.user, message=msg)
-
-            if self.new_quantity <= self.item.low_stock_threshold:
-                Notification.objects.create(
-                    user=self.user,
-                    message=f"Low stock warning: {self.item.name} has reached a critical level — only {self.new_quantity} unit(s) remaining."
-                )
-                Notification.objects.create(
-                    user=self.user,
-                    message=f"Low stock alert: {self.item.name} has only {self.new_quantity} units left."
-                )
-
-        super().save(*args, **kwargs)
+            dispatcher.dispatch(change_notifications(self, self.item, using=using), using=using)
 
 
     class Meta:
+        indexes = [
+            # Keyset pagination of a user's change log
+            models.Index(fields=['user', '-change_date', '-id'], name='change_user_date_idx'),
+            # History of a single item
+            models.Index(fields=['item', '-change_date'], name='change_item_date_idx'),
+            # ?search= on the change reason
+            GinIndex(SearchVector('reason', config=SEARCH_CONFIG), name='change_reason_search_idx'),
+        ]
         ordering = ['-change_date']
 
@@ -0,0 +1,225 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from functools import partial
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .pubsub import publish
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ASYNC': True,
+    'FLUSH_INTERVAL': 0.5,
+    'BATCH_SIZE': 500,
+    'LOW_STOCK_ALERT_WINDOW': 3600,
+}
+
+
+def notification_setting(name):
+    return getattr(settings, 'NOTIFICATIONS', {}).get(name, DEFAULTS[name])
+
+
+# Notification text for a recorded change
+def change_message(change, item):
+    units = abs(change.quantity_change)
+    if change.change_type == 'SALE':
+        return f"Sale recorded: {item.name} — {units} unit(s) sold. Updated stock level: {change.new_quantity}."
+    if change.change_type == 'RESTOCK':
+        return f"Restock completed: {units} unit(s) of {item.name} added to inventory. Current stock: {change.new_quantity}."
+    if change.change_type == 'RETURN':
+        return f"Return processed: {units} unit(s) of {item.name} returned to inventory. New stock level: {change.new_quantity}."
+    return f"Damage reported: {units} unit(s) of {item.name} marked as damaged. Remaining stock: {change.new_quantity}."
+
+
+def low_stock_message(item, quantity):
+    return f"Low stock alert: {item.name} has reached a critical level — only {quantity} unit(s) remaining."
+
+
+# Entries are (user_id, message, dedupe_key). Low-stock alerts carry the item id
+# as their key so one item raises at most one alert per window.
+def change_notifications(change, item, using='default'):
+    entries = [(change.user_id, change_message(change, item), None)]
+    if change.new_quantity <= item.low_stock_threshold:
+        entries.append((change.user_id, low_stock_message(item, change.new_quantity), item.pk))
+    else:
+        # Back above the threshold, the next drop should alert again
+        dispatcher.forget(item.pk, using=using)
+    return entries
+
+
+# UNREAD COUNTER
+# Profile.unread_notifications is moved by delta whenever notifications are
+# written, read or deleted, so the badge count never needs a COUNT(*).
+# updated_at moves with it (same clock as auto_now), it is the profile's
+# ETag / Last-Modified validator.
+def adjust_unread_count(user_id, delta, using='default'):
+    from .models import Profile
+
+    Profile.objects.using(using).filter(user_id=user_id).update(
+        unread_notifications=Greatest(F('unread_notifications') + delta, 0),
+        updated_at=timezone.now(),
+    )
+
+
+# Both only move the counter by the rows their conditional UPDATE actually
+# flipped, so concurrent requests and new notifications can't make it drift
+def set_read(notification, is_read, using='default'):
+    from .models import Notification
+
+    with transaction.atomic(using=using):
+        changed = (
+            Notification.objects.using(using)
+            .filter(pk=notification.pk, is_read=not is_read)
+            .update(is_read=is_read)
+        )
+        if changed and notification.user_id is not None:
+            adjust_unread_count(notification.user_id, -1 if is_read else 1, using=using)
+    notification.is_read = is_read
+    return bool(changed)
+
+
+def mark_all_read(user_id, using='default'):
+    from .models import Notification
+
+    with transaction.atomic(using=using):
+        updated = Notification.objects.using(using).filter(user_id=user_id, is_read=False).update(is_read=True)
+        if updated:
+            adjust_unread_count(user_id, -updated, using=using)
+    return updated
+
+
+# NOTIFICATION DISPATCHER
+# Collects notifications in memory and writes them with bulk_create from a
+# background thread, so stock changes don't pay for the inserts in the request.
+class NotificationDispatcher:
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._alerted = {}
+        self._worker = None
+
+    # Queue entries once the surrounding transaction commits. Without the async
+    # pipeline they are written straight away, inside the caller's transaction.
+    # Alerts are only marked as sent on commit, so a change that is rolled back
+    # doesn't silence the alert of the one that replaces it.
+    def dispatch(self, entries, using='default'):
+        entries = self._dedupe(entries)
+        if not entries:
+            return
+        if not notification_setting('ASYNC'):
+            self.write(entries, using=using)
+            transaction.on_commit(partial(self._dedupe, entries, remember=True), using=using)
+            return
+        transaction.on_commit(partial(self._enqueue, entries, using), using=using)
+
+    def forget(self, key, using='default'):
+        transaction.on_commit(partial(self._forget, key), using=using)
+
+    def flush(self):
+        batches = {}
+        while True:
+            try:
+                entries, using = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batches.setdefault(using, []).extend(entries)
+        for using, entries in batches.items():
+            try:
+                self.write(entries, using=using)
+            except DatabaseError:
+                # One bad entry (a user deleted since, ...) must not drop everyone else's
+                self._write_per_user(entries, using)
+
+    def _write_per_user(self, entries, using):
+        entries_by_user = {}
+        for entry in entries:
+            entries_by_user.setdefault(entry[0], []).append(entry)
+        for user_id, user_entries in entries_by_user.items():
+            try:
+                self.write(user_entries, using=using)
+            except DatabaseError:
+                logger.exception("Dropped %d notification(s) for user %s", len(user_entries), user_id)
+
+    def write(self, entries, using='default'):
+        from .models import Notification
+
+        # Identical messages for the same user in one batch are written once
+        unique = list(dict.fromkeys((user_id, message) for user_id, message, _ in entries))
+        notifications = [Notification(user_id=user_id, message=message) for user_id, message in unique]
+        with transaction.atomic(using=using):
+            Notification.objects.using(using).bulk_create(notifications, batch_size=notification_setting('BATCH_SIZE'))
+            for user_id, count in Counter(user_id for user_id, _ in unique).items():
+                if user_id is not None:
+                    adjust_unread_count(user_id, count, using=using)
+            transaction.on_commit(partial(self._publish, notifications), using=using)
+
+    # Push the new rows to connected clients (see NotificationStreamView)
+    def _publish(self, notifications):
+        for notification in notifications:
+            if notification.user_id is None:
+                continue
+            publish(notification.user_id, 'notification', {
+                'id': notification.id,
+                'message': notification.message,
+                'is_read': notification.is_read,
+                'created_at': notification.created_at.isoformat(),
+            })
+
+    # Drops alerts already sent within the window (and repeats in the batch),
+    # remember=True marks the ones kept as sent
+    def _dedupe(self, entries, remember=False):
+        window = notification_setting('LOW_STOCK_ALERT_WINDOW')
+        now = time.monotonic()
+        kept = []
+        seen = set()
+        with self._lock:
+            for entry in entries:
+                key = entry[2]
+                if key is not None:
+                    if key in seen or now - self._alerted.get(key, float('-inf')) < window:
+                        continue
+                    seen.add(key)
+                    if remember:
+                        self._alerted[key] = now
+                kept.append(entry)
+        return kept
+
+    def _forget(self, key):
+        with self._lock:
+            self._alerted.pop(key, None)
+
+    def _enqueue(self, entries, using):
+        # Checked again, another transaction may have sent the same alert since dispatch
+        entries = self._dedupe(entries, remember=True)
+        if not entries:
+            return
+        self._queue.put((entries, using))
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='notification-dispatcher', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            time.sleep(notification_setting('FLUSH_INTERVAL'))
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                # A failed batch must not kill the worker, the next one may succeed
+                logger.exception("Failed to write notifications")
+            finally:
+                close_old_connections()
+
+
+dispatcher = NotificationDispatcher()
+atexit.register(dispatcher.flush)
@@ -0,0 +1,158 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+# KEYSET (CURSOR) PAGINATION
+# Pages are read with WHERE (key, id) < (last key, last id) instead of OFFSET, so
+# deep pages cost the same as the first one. The total count is returned by
+# default and skipped with ?count=false (or requested with ?count=true where
+# count_by_default is off).
+class KeysetPagination(BasePagination):
+    ordering = ('-updated_at', '-id')
+    search_ordering = ('-search_rank', '-id')
+    page_size = api_settings.PAGE_SIZE or 100
+    max_page_size = 1000
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_by_default = True
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        count_queryset, page_queryset = self.prepare(queryset, request)
+        count = count_queryset.count() if count_queryset is not None else None
+        return self.set_page(list(page_queryset), count)
+
+    # Returns the queryset to count (None when no count is wanted) and the page
+    # to fetch, so async views can run both queries at the same time
+    def prepare(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        ordering = self.ordering
+        if 'search_rank' in queryset.query.annotations:
+            # Ranked search results, best match first
+            ordering = self.search_ordering
+        self.key_field = ordering[0].lstrip('-')
+        descending = ordering[0].startswith('-')
+
+        include_count = request.query_params.get(self.count_query_param)
+        if include_count is None:
+            include_count = self.count_by_default
+        else:
+            include_count = include_count.lower() not in ['false', '0', 'no']
+        count_queryset = queryset if include_count else None
+
+        queryset = queryset.order_by(*ordering)
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            key, pk = cursor
+            op = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                # Redundant with the OR below, but gives the index scan its starting point
+                Q(**{f'{self.key_field}__{op}e': key}),
+                Q(**{f'{self.key_field}__{op}': key}) | Q(**{self.key_field: key, f'pk__{op}': pk}),
+            )
+        return count_queryset, queryset[:self.page_size + 1]
+
+    def set_page(self, results, count):
+        self.count = count
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            key, pk = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if isinstance(key, str):
+                key = parse_datetime(key) or key
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return key, pk
+
+    def encode_cursor(self, obj):
+        key = getattr(obj, self.key_field)
+        # Full precision, a truncated timestamp would skip or repeat rows
+        if isinstance(key, datetime):
+            key = key.isoformat()
+        encoded = base64.urlsafe_b64encode(json.dumps([key, obj.pk]).encode('ascii')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        payload = {'next': self.get_next_link(), 'first': self.get_first_link(), 'results': data}
+        if self.count is not None:
+            payload = {'count': self.count, **payload}
+        return payload
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'example': 123},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {'name': self.cursor_query_param, 'required': False, 'in': 'query',
+             'description': 'The pagination cursor value.', 'schema': {'type': 'string'}},
+            {'name': self.page_size_query_param, 'required': False, 'in': 'query',
+             'description': 'Number of results to return per page.', 'schema': {'type': 'integer'}},
+            {'name': self.count_query_param, 'required': False, 'in': 'query',
+             'description': 'Whether to include the total count.', 'schema': {'type': 'boolean'}},
+        ]
+
+
+# Items and suppliers, newest update first
+class UpdatedAtKeysetPagination(KeysetPagination):
+    ordering = ('-updated_at', '-id')
+
+
+# Inventory change log, newest change first
+class ChangeDateKeysetPagination(KeysetPagination):
+    ordering = ('-change_date', '-id')
+
+
+# Notification feed, newest first. Polling clients rarely need a total, so it is opt-in
+class NotificationKeysetPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+    count_by_default = False
+
+
+# Reorder forecast, items in id order; each page is forecast on its own
+class ItemIdKeysetPagination(KeysetPagination):
+    ordering = ('id',)
+    count_by_default = False
@@ -0,0 +1,124 @@
+from collections import defaultdict
+from datetime import timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Abs, TruncDay, TruncHour
+
+from .models import InventoryChange, StockMovementRollup
+
+GRANULARITIES = {
+    'HOUR': TruncHour,
+    'DAY': TruncDay,
+}
+
+
+def bucket_start(moment, granularity):
+    moment = moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if granularity == 'DAY':
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def _movement_totals(changes):
+    totals = defaultdict(lambda: [0, 0])
+    for change in changes:
+        for granularity in GRANULARITIES:
+            bucket = bucket_start(change.change_date, granularity)
+            for item_id in (change.item_id, None):
+                key = (change.item.user_id, item_id, change.change_type, granularity, bucket)
+                totals[key][0] += abs(change.quantity_change)
+                totals[key][1] += 1
+    return totals
+
+
+# Add recorded changes to their hourly and daily buckets, both per item and for
+# the owner's whole inventory. Changes must be saved (change_date set) and have
+# their item loaded.
+def record_movements(changes, using='default'):
+    totals = _movement_totals(changes)
+    with transaction.atomic(using=using):
+        for (user_id, item_id, change_type, granularity, bucket), (quantity, count) in totals.items():
+            _add_to_bucket(user_id, item_id, change_type, granularity, bucket, quantity, count, using)
+
+
+# Items created in the same transaction have no buckets yet, so theirs are
+# inserted in bulk and only the owner's buckets need an upsert
+def record_new_item_movements(changes, using='default'):
+    totals = _movement_totals(changes)
+    with transaction.atomic(using=using):
+        StockMovementRollup.objects.using(using).bulk_create(
+            [
+                StockMovementRollup(
+                    user_id=user_id, item_id=item_id, change_type=change_type, granularity=granularity,
+                    bucket_start=bucket, quantity=quantity, change_count=count,
+                )
+                for (user_id, item_id, change_type, granularity, bucket), (quantity, count) in totals.items()
+                if item_id is not None
+            ],
+            batch_size=1000,
+        )
+        for (user_id, item_id, change_type, granularity, bucket), (quantity, count) in totals.items():
+            if item_id is None:
+                _add_to_bucket(user_id, item_id, change_type, granularity, bucket, quantity, count, using)
+
+
+def _add_to_bucket(user_id, item_id, change_type, granularity, bucket, quantity, count, using):
+    lookup = {'change_type': change_type, 'granularity': granularity, 'bucket_start': bucket}
+    if item_id is None:
+        lookup.update(user_id=user_id, item__isnull=True)
+    else:
+        lookup.update(item_id=item_id)
+
+    queryset = StockMovementRollup.objects.using(using).filter(**lookup)
+    updates = {'quantity': F('quantity') + quantity, 'change_count': F('change_count') + count}
+    if queryset.update(**updates):
+        return
+    try:
+        with transaction.atomic(using=using):
+            StockMovementRollup.objects.using(using).create(
+                user_id=user_id, item_id=item_id, change_type=change_type, granularity=granularity,
+                bucket_start=bucket, quantity=quantity, change_count=count,
+            )
+    except IntegrityError:
+        # Created by a concurrent writer in the meantime
+        queryset.update(**updates)
+
+
+# Rebuild the rollups from the change log with grouped queries
+def backfill_rollups(user_ids=None, using='default'):
+    changes = InventoryChange.objects.using(using).order_by()
+    rollups = StockMovementRollup.objects.using(using)
+    if user_ids is not None:
+        changes = changes.filter(item__user_id__in=user_ids)
+        rollups = rollups.filter(user_id__in=user_ids)
+
+    created = 0
+    with transaction.atomic(using=using):
+        rollups.delete()
+        for granularity, trunc in GRANULARITIES.items():
+            buckets = changes.annotate(bucket=trunc('change_date', tzinfo=dt_timezone.utc))
+            for group_by in (('item__user_id', 'item_id'), ('item__user_id',)):
+                rows = (
+                    buckets.values(*group_by, 'change_type', 'bucket')
+                    .annotate(quantity=Sum(Abs('quantity_change')), change_count=Count('id'))
+                    .iterator(chunk_size=5000)
+                )
+                batch = []
+                for row in rows:
+                    batch.append(StockMovementRollup(
+                        user_id=row['item__user_id'],
+                        item_id=row.get('item_id'),
+                        change_type=row['change_type'],
+                        granularity=granularity,
+                        bucket_start=row['bucket'],
+                        quantity=row['quantity'] or 0,
+                        change_count=row['change_count'],
+                    ))
+                    if len(batch) >= 5000:
+                        StockMovementRollup.objects.using(using).bulk_create(batch)
+                        created += len(batch)
+                        batch = []
+                StockMovementRollup.objects.using(using).bulk_create(batch)
+                created += len(batch)
+    return created
@@ -0,0 +1,89 @@
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .database import replica_monitor, replicas_setting
+
+# Routing state of the request being served, None outside requests
+_request_state = ContextVar('replica_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self, primary=False):
+        self.primary = primary
+
+
+# READ-REPLICA ROUTER
+# Reads made while serving a GET/HEAD/OPTIONS request go to a replica that is
+# up and within MAX_LAG, or to the primary when there is none. Once the request
+# writes, or inside a transaction, the rest of its reads stay on the primary so
+# it sees its own writes. Other methods read from the primary throughout, since
+# what they read (stock levels, barcodes) is checked before writing. Writes,
+# migrations and everything outside requests (management commands, workers) use
+# the primary.
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if state is None or state.primary or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = replica_monitor.available()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    # Always named, otherwise saving an instance read from a replica would write to it
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas_setting('ALIASES')}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas_setting('ALIASES'):
+            return False
+        return None
+
+
+# The rest of the current request reads from the primary. Also for reads whose
+# result outlives the request (cached payloads): a lagging replica could still
+# return rows from before a write whose invalidation has already happened.
+def pin_to_primary():
+    state = _request_state.get()
+    if state is not None:
+        state.primary = True
+
+
+def _request_routing_state(request):
+    return RoutingState(primary=request.method not in SAFE_METHODS)
+
+
+# Gives every request its own routing state (sync and async requests)
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _request_state.set(_request_routing_state(request))
+        try:
+            return self.get_response(request)
+        finally:
+            _request_state.reset(token)
+
+    async def __acall__(self, request):
+        token = _request_state.set(_request_routing_state(request))
+        try:
+            return await self.get_response(request)
+        finally:
+            _request_state.reset(token)
@@ -0,0 +1,125 @@
+import re
+import threading
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils.module_loading import import_string
+from rest_framework.filters import SearchFilter
+
+from .models import SEARCH_CONFIG
+
+MAX_QUERY_LENGTH = 200
+
+
+# POSTGRES FULL-TEXT + TRIGRAM SEARCH
+# search_fields are matched as one tsvector, built exactly like the expression
+# GIN index on the model so the index is used. search_fuzzy_fields are matched
+# with pg_trgm word similarity, which catches typos and partial words (typeahead).
+class PostgresSearchBackend:
+    config = SEARCH_CONFIG
+
+    def search(self, queryset, query, document_fields, fuzzy_fields=()):
+        search_query = SearchQuery(query, config=self.config, search_type='websearch')
+        queryset = queryset.alias(search_document=SearchVector(*document_fields, config=self.config))
+
+        condition = Q(search_document=search_query)
+        rank = SearchRank(F('search_document'), search_query)
+        similarities = []
+        for field in fuzzy_fields:
+            condition |= Q(**{f'{field}__trigram_word_similar': query})
+            similarities.append(Coalesce(TrigramWordSimilarity(query, field), Value(0.0)))
+        if similarities:
+            rank = rank + (Greatest(*similarities) if len(similarities) > 1 else similarities[0])
+
+        return queryset.annotate(search_rank=rank).filter(condition)
+
+
+# IN-MEMORY INVERTED INDEX
+# Same contract without Postgres, for tests and SQLite development databases.
+# The index is built from the candidate rows on every search.
+class LocalSearchBackend:
+    # Same default as pg_trgm.word_similarity_threshold
+    similarity_threshold = 0.6
+
+    def search(self, queryset, query, document_fields, fuzzy_fields=()):
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none()
+        fields = list(dict.fromkeys([*document_fields, *fuzzy_fields]))
+
+        index = {}
+        fuzzy_values = {}
+        for pk, *values in queryset.order_by().values_list('pk', *fields):
+            row = dict(zip(fields, values))
+            for field in document_fields:
+                for token in tokenize(row[field]):
+                    index.setdefault(token, set()).add(pk)
+            fuzzy_values[pk] = [row[field] for field in fuzzy_fields]
+
+        scores = {}
+        for term in terms:
+            for token, pks in index.items():
+                if token == term or token.startswith(term):
+                    weight = 1.0 if token == term else 0.5
+                    for pk in pks:
+                        scores[pk] = scores.get(pk, 0.0) + weight / len(terms)
+
+        phrase = ' '.join(terms)
+        for pk, values in fuzzy_values.items():
+            similarity = max((word_similarity(phrase, value) for value in values), default=0.0)
+            if similarity >= self.similarity_threshold or pk in scores:
+                scores[pk] = scores.get(pk, 0.0) + similarity
+
+        if not scores:
+            return queryset.none()
+        rank = Case(*(When(pk=pk, then=Value(score)) for pk, score in scores.items()), output_field=FloatField())
+        return queryset.filter(pk__in=scores).annotate(search_rank=rank)
+
+
+def tokenize(text):
+    return re.findall(r'\w+', str(text or '').lower())
+
+
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# Share of the query's trigrams found in the closest run of words of the value,
+# close to pg_trgm's word_similarity
+def word_similarity(query, value):
+    query_words = tokenize(query)
+    wanted = set().union(*(trigrams(word) for word in query_words)) if query_words else set()
+    if not wanted:
+        return 0.0
+    words = tokenize(value)
+    best = 0.0
+    for start in range(len(words)):
+        found = set().union(*(trigrams(word) for word in words[start:start + len(query_words)]))
+        best = max(best, len(wanted & found) / len(wanted))
+    return best
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(getattr(settings, 'SEARCH_BACKEND', 'inventory.search.PostgresSearchBackend'))()
+    return _backend
+
+
+# ?search= on list views, ranked by the configured backend (best match first, see KeysetPagination)
+class RankedSearchFilter(SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        document_fields = self.get_search_fields(view, request)
+        query = ' '.join(self.get_search_terms(request))[:MAX_QUERY_LENGTH]
+        if not document_fields or not query:
+            return queryset
+        return get_search_backend().search(queryset, query, document_fields, getattr(view, 'search_fuzzy_fields', ()))
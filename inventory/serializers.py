@@ -1,5 +1,8 @@
+from decimal import Decimal
+
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 from .models import (Category, CustomUser, InventoryChange, InventoryItem, Notification,
                      Profile, Supplier)
@@ -42,7 +45,7 @@ class ProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = Profile
         fields = '__all__'
-        read_only_fields = ('user', 'updated_at', 'created_at')
+        read_only_fields = ('user', 'unread_notifications', 'updated_at', 'created_at')
 
 
 # 3. Only Admin users should see all fields
@@ -138,6 +141,18 @@ class InventoryItemUpdateSerializer(serializers.ModelSerializer):
         return value
     
 
+# Validate change type logic
+def validate_change_direction(change_type, quantity_change):
+    if change_type in ['SALE', 'DAMAGE'] and quantity_change > 0:
+        raise serializers.ValidationError(
+            {"quantity_change": f"{change_type} must have negative quantity change."}
+        )
+
+    if change_type in ['RESTOCK', 'RETURN'] and quantity_change < 0:
+        raise serializers.ValidationError(
+            {"quantity_change": f"{change_type} must have positive quantity change."}
+        )
+
 # 8. Inventory Change Serializer
 class InventoryChangeSerializer(serializers.ModelSerializer):
     item_name = serializers.ReadOnlyField(source='item.name')
@@ -159,17 +174,8 @@ class InventoryChangeSerializer(serializers.ModelSerializer):
         change_type = attrs.get('change_type')
         quantity_change = attrs.get('quantity_change')
         
-        # Validate change type logic
-        if change_type in ['SALE', 'DAMAGE'] and quantity_change > 0:
-            raise serializers.ValidationError(
-                {"quantity_change": f"{change_type} must have negative quantity change."}
-            )
-        
-        if change_type in ['RESTOCK', 'RETURN'] and quantity_change < 0:
-            raise serializers.ValidationError(
-                {"quantity_change": f"{change_type} must have positive quantity change."}
-            )
-        
+        validate_change_direction(change_type, quantity_change)
+
         # Prevent negative stock
         if item and quantity_change < 0:
             current_stock = item.quantity
@@ -180,6 +186,91 @@ class InventoryChangeSerializer(serializers.ModelSerializer):
         
         return attrs
 
+# 8.1 Bulk Inventory Change Row Serializer
+# Items are resolved for the whole batch at once in the view, so the item is only a key here
+class InventoryChangeBulkRowSerializer(serializers.Serializer):
+    item = serializers.CharField(max_length=22)
+    change_type = serializers.ChoiceField(choices=InventoryChange.CHANGE_TYPE)
+    quantity_change = serializers.IntegerField()
+    reason = serializers.CharField(required=False, allow_blank=True, default='')
+
+    def validate_quantity_change(self, value):
+        if value == 0:
+            raise serializers.ValidationError("Quantity change cannot be zero.")
+        return value
+
+    def validate(self, attrs):
+        validate_change_direction(attrs['change_type'], attrs['quantity_change'])
+        return attrs
+
+# 8.2 Inventory Import Row Serializer
+# Category and supplier come in by name, the importer resolves them in bulk
+class InventoryImportRowSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=200)
+    description = serializers.CharField(required=False, allow_blank=True)
+    category = serializers.CharField(max_length=150)
+    supplier = serializers.CharField(max_length=200, required=False, allow_blank=True, allow_null=True)
+    quantity = serializers.IntegerField(required=False)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    low_stock_threshold = serializers.IntegerField(required=False)
+    barcode = serializers.CharField(max_length=100, required=False, allow_blank=True, allow_null=True)
+
+    # Same rules as InventoryItemSerializer
+    def validate_name(self, value):
+        if len(value) < 3:
+            raise serializers.ValidationError("Name must be at least 3 characters long.")
+        return value
+    def validate_quantity(self, value):
+        if value < 0:
+            raise serializers.ValidationError("Quantity cannot be negative.")
+        return value
+    def validate_price(self, value):
+        if value < 0:
+            raise serializers.ValidationError("Price cannot be negative.")
+        return value
+    def validate_low_stock_threshold(self, value):
+        if value < 0:
+            raise serializers.ValidationError("Low stock threshold cannot be negative.")
+        return value
+    def validate(self, attrs):
+        if 'quantity' in attrs and 'low_stock_threshold' in attrs:
+            if attrs['quantity'] < attrs['low_stock_threshold']:
+                raise serializers.ValidationError("Quantity cannot be less than low stock threshold.")
+        return attrs
+
+# 8.3 Bulk Item Selection Serializer (an id list or the same filters as the item list)
+class InventoryBulkSelectionSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.CharField(max_length=22), allow_empty=False, max_length=10000, required=False)
+    filter = serializers.DictField(required=False)
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError("Provide either 'ids' or 'filter'.")
+        return attrs
+
+# 8.4 Bulk Item Patch Serializer
+class InventoryBulkPatchSerializer(serializers.Serializer):
+    price_multiplier = serializers.DecimalField(max_digits=7, decimal_places=4, min_value=Decimal('0.0001'), required=False)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    low_stock_threshold = serializers.IntegerField(min_value=0, required=False)
+    category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), required=False)
+    supplier = serializers.PrimaryKeyRelatedField(queryset=Supplier.objects.all(), required=False, allow_null=True)
+
+    def validate_supplier(self, value):
+        if value is not None and value.user_id != self.context['request'].user.pk:
+            raise serializers.ValidationError("Supplier not found.")
+        return value
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError("The patch must change at least one field.")
+        if 'price' in attrs and 'price_multiplier' in attrs:
+            raise serializers.ValidationError("Use either 'price' or 'price_multiplier', not both.")
+        return attrs
+
+class InventoryBulkUpdateSerializer(InventoryBulkSelectionSerializer):
+    patch = InventoryBulkPatchSerializer()
+
 # 9. Supplier Serializer 
 class SupplierSerializer(serializers.ModelSerializer):
     class Meta:
@@ -196,4 +287,20 @@ class SupplierSerializer(serializers.ModelSerializer):
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = ['id', 'user', 'message', 'is_read', 'created_at']
\ No newline at end of file
+        fields = ['id', 'user', 'message', 'is_read', 'created_at']
+
+# 10. Forecast Parameters Serializer
+class ForecastParamsSerializer(serializers.Serializer):
+    history_days = serializers.IntegerField(min_value=7, max_value=730, default=90)
+    window_days = serializers.IntegerField(min_value=1, max_value=365, default=28)
+    alpha = serializers.FloatField(min_value=0.01, max_value=1, default=0.3)
+    lead_time_days = serializers.IntegerField(min_value=0, max_value=365, default=7)
+    service_level_z = serializers.FloatField(min_value=0, max_value=5, default=1.65)
+
+# 11. Token Obtain Serializer (the claims-only authentication reads is_staff from the token)
+class TokenObtainPairWithClaimsSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['is_staff'] = user.is_staff
+        return token
@@ -0,0 +1,215 @@
+from collections import defaultdict
+from decimal import Decimal
+from functools import partial
+
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .cache import invalidate
+from .notifications import change_notifications, dispatcher
+from .pubsub import publish
+from .rollups import record_movements
+from .summary import (COUNTERS, apply_category_totals_change, apply_summary_delta, category_totals_of,
+                      stock_movement_delta)
+
+# CHANGE TYPES THAT TAKE STOCK OUT OF INVENTORY
+OUTBOUND_CHANGE_TYPES = ('SALE', 'DAMAGE')
+
+
+class InsufficientStock(ValidationError):
+    pass
+
+
+# Signed delta for a change, whatever sign the client sent the quantity with
+def stock_delta(change_type, quantity_change):
+    units = abs(quantity_change)
+    return -units if change_type in OUTBOUND_CHANGE_TYPES else units
+
+
+# Apply a stock delta in a single conditional UPDATE and return the new quantity.
+# The row is only touched when the result stays >= 0, so concurrent writers can
+# never lose an update or push the stock negative. low_water is the lowest point
+# the stock reaches on the way to delta when several changes are applied at once.
+def apply_stock_delta(item_id, delta, using='default', low_water=None):
+    from .models import InventoryItem
+
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    sql = (
+        f"UPDATE {qn(InventoryItem._meta.db_table)} "
+        f"SET {qn('quantity')} = {qn('quantity')} + %s, {qn('updated_at')} = %s "
+        f"WHERE {qn('id')} = %s AND {qn('quantity')} + %s >= 0 "
+        f"RETURNING {qn('quantity')}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [delta, now, item_id, delta if low_water is None else low_water])
+        row = cursor.fetchone()
+
+    if row is None:
+        raise InsufficientStock(
+            f"Cannot reduce stock below zero. Attempted: {delta}",
+            code='insufficient_stock',
+        )
+    return row[0]
+
+
+# Tell the item owner's connected clients about the new stock level once it is committed
+def publish_stock_level(user_id, item, quantity, using='default'):
+    event = {
+        'item': item.pk,
+        'name': item.name,
+        'quantity': quantity,
+        'is_low_stock': quantity <= item.low_stock_threshold,
+    }
+    transaction.on_commit(partial(publish, user_id, 'stock', event), using=using)
+    # The raw UPDATE doesn't send post_save, so the cached payloads are dropped here
+    invalidate(user_id, using=using)
+
+
+# Record a batch of changes for one user. Each item gets its net delta applied
+# with one UPDATE, and the change rows and notifications are bulk inserted.
+# rows is a list of (index, validated_data); returns one result per row.
+def record_changes_bulk(user, rows, using='default'):
+    from .models import InventoryChange, InventoryItem
+
+    item_ids = {data['item'] for _, data in rows}
+    items = (
+        InventoryItem.objects.using(using)
+        .filter(user=user, pk__in=item_ids)
+        .only('id', 'user_id', 'category_id', 'name', 'price', 'low_stock_threshold')
+        .in_bulk()
+    )
+
+    results = {}
+    rows_by_item = defaultdict(list)
+    for index, data in rows:
+        if data['item'] in items:
+            rows_by_item[data['item']].append((index, data))
+        else:
+            results[index] = {"index": index, "status": "error", "errors": {"item": ["Inventory item not found."]}}
+
+    changes = []
+    notifications = []
+    summary_deltas = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    with transaction.atomic(using=using):
+        # Items are locked in id order, and the summary rows only once every item is,
+        # so concurrent batches and single changes (item, then summary) can't deadlock
+        for item_id in sorted(rows_by_item):
+            item, item_rows = items[item_id], rows_by_item[item_id]
+            deltas = [stock_delta(data['change_type'], data['quantity_change']) for _, data in item_rows]
+
+            # Lowest running total, so no change in the sequence dips below zero
+            running = low_water = 0
+            for delta in deltas:
+                running += delta
+                low_water = min(low_water, running)
+
+            try:
+                quantity = apply_stock_delta(item_id, running, using=using, low_water=low_water) - running
+            except InsufficientStock:
+                for index, _ in item_rows:
+                    results[index] = {
+                        "index": index,
+                        "status": "error",
+                        "errors": {"quantity_change": ["Cannot reduce stock below zero."]},
+                    }
+                continue
+
+            publish_stock_level(user.pk, item, quantity + running, using=using)
+            for name, value in stock_movement_delta(item, quantity, quantity + running).items():
+                summary_deltas[item.category_id][name] += value
+
+            for (index, data), delta in zip(item_rows, deltas):
+                change = InventoryChange(
+                    item=item,
+                    user=user,
+                    change_type=data['change_type'],
+                    quantity_change=data['quantity_change'],
+                    previous_quantity=quantity,
+                    new_quantity=quantity + delta,
+                    reason=data.get('reason', ''),
+                )
+                quantity = change.new_quantity
+                changes.append(change)
+                notifications.extend(change_notifications(change, item, using=using))
+                results[index] = {
+                    "index": index,
+                    "status": "created",
+                    "id": change.id,
+                    "item": item_id,
+                    "previous_quantity": change.previous_quantity,
+                    "new_quantity": change.new_quantity,
+                }
+
+        for category_id in sorted(summary_deltas):
+            apply_summary_delta(user.pk, category_id, summary_deltas[category_id], using=using)
+
+        # bulk_create skips InventoryChange.save(), the stock has already been moved above
+        InventoryChange.objects.using(using).bulk_create(changes, batch_size=1000)
+        record_movements(changes, using=using)
+        dispatcher.dispatch(notifications, using=using)
+
+    return [results[index] for index, _ in rows]
+
+
+# Prices must stay below 10 ** (max_digits - decimal_places) of InventoryItem.price
+MAX_PRICE = Decimal('100000000')
+
+
+# BULK ITEM UPDATES AND DELETES
+# One UPDATE / DELETE over the whole selection instead of a save per item. Item
+# signals don't fire, so the owner's summaries are moved by the difference of the
+# selection's totals before and after, and the cache is refreshed once after.
+def _lock_selection(items, using):
+    from .models import InventoryItem
+
+    # In id order, like record_changes_bulk, and pinned to the ids so the rows
+    # written are exactly the rows counted
+    pks = list(items.using(using).order_by('pk').select_for_update().values_list('pk', flat=True))
+    return InventoryItem.objects.using(using).filter(pk__in=pks)
+
+
+def bulk_update_items(user_id, items, patch, using='default'):
+    updates = {'updated_at': timezone.now()}
+    if 'price_multiplier' in patch:
+        updates['price'] = Round(F('price') * patch['price_multiplier'], 2)
+    for field in ('price', 'low_stock_threshold', 'category', 'supplier'):
+        if field in patch:
+            updates[field] = patch[field]
+
+    with transaction.atomic(using=using):
+        selection = _lock_selection(items, using)
+        before = category_totals_of(selection, using=using)
+        updated = selection.update(**updates)
+        if updated:
+            apply_category_totals_change(user_id, before, category_totals_of(selection, using=using), using=using)
+            invalidate(user_id, using=using)
+    return updated
+
+
+def bulk_delete_items(user_id, items, using='default'):
+    from .models import InventoryChange, InventoryItem, StockMovementRollup
+
+    connection = connections[using]
+    table = connection.ops.quote_name(InventoryItem._meta.db_table)
+    pk_column = connection.ops.quote_name(InventoryItem._meta.pk.column)
+
+    with transaction.atomic(using=using):
+        selection = _lock_selection(items, using)
+        before = category_totals_of(selection, using=using)
+        ids = selection.values('pk')
+        # Rows pointing at the items go first, each in a single DELETE
+        changes, _ = InventoryChange.objects.using(using).filter(item__in=ids).delete()
+        StockMovementRollup.objects.using(using).filter(item__in=ids).delete()
+        sql, params = ids.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE {pk_column} IN ({sql})", params)
+            deleted = cursor.rowcount
+        if deleted:
+            apply_category_totals_change(user_id, before, {}, using=using)
+            invalidate(user_id, using=using)
+    return deleted, changes
@@ -1,6 +1,12 @@
-from django.db.models.signals import post_save
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import CustomUser, Notification, Profile, InventoryItem, InventoryChange
+from .authentication import invalidate_user
+from .cache import GLOBAL_SCOPE, invalidate
+from .database import connection_metrics
+from .models import Category, CustomUser, Notification, Profile, InventoryItem, InventoryChange, Supplier
+from .summary import apply_summary_delta, contribution, difference, item_contribution
 
 
 # Signal to create or update user profile when a User instance is created or updated
@@ -22,4 +28,82 @@ def create_initial_inventory_change(sender, instance, created, **kwargs):
             previous_quantity=0,
             new_quantity=instance.quantity,
             reason='Initial stock entry',
-        )
\ No newline at end of file
+        )
+
+
+# Authenticated users are cached with their profile, drop them when either changes
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_user(sender, instance, using, **kwargs):
+    invalidate_user(instance.pk, using=using)
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_cached_profile(sender, instance, using, **kwargs):
+    invalidate_user(instance.user_id, using=using)
+
+
+# Drop the owner's cached lists and details whenever their items or suppliers change
+@receiver(post_save, sender=InventoryItem)
+@receiver(post_delete, sender=InventoryItem)
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+def invalidate_tenant_cache(sender, instance, using, **kwargs):
+    if instance.user_id:
+        invalidate(instance.user_id, using=using)
+
+# Categories are shared by every user
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, using, **kwargs):
+    invalidate(GLOBAL_SCOPE, using=using)
+
+
+# Keep InventorySummary / CategorySummary in step with item writes.
+# The row as stored before the save is what gets taken off the totals.
+@receiver(pre_save, sender=InventoryItem)
+def remember_item_before_save(sender, instance, raw, using, **kwargs):
+    instance._summary_before = None
+    if raw or instance._state.adding:
+        return
+    instance._summary_before = (
+        InventoryItem.objects.using(using)
+        .filter(pk=instance.pk)
+        .values('user_id', 'category_id', 'quantity', 'price', 'low_stock_threshold')
+        .first()
+    )
+
+@receiver(post_save, sender=InventoryItem)
+def update_summary_on_item_save(sender, instance, created, raw, using, **kwargs):
+    if raw:
+        return
+    after = item_contribution(instance)
+    before = getattr(instance, '_summary_before', None)
+    if before is None:
+        apply_summary_delta(instance.user_id, instance.category_id, after, using=using)
+        return
+
+    previous = contribution(before['quantity'], before['price'], before['low_stock_threshold'])
+    if (before['user_id'], before['category_id']) == (instance.user_id, instance.category_id):
+        apply_summary_delta(instance.user_id, instance.category_id, difference(after, previous), using=using)
+    else:
+        # Moved to another category or owner
+        apply_summary_delta(before['user_id'], before['category_id'], difference({}, previous), using=using, create=False)
+        apply_summary_delta(instance.user_id, instance.category_id, after, using=using)
+
+@receiver(post_delete, sender=InventoryItem)
+def update_summary_on_item_delete(sender, instance, using, **kwargs):
+    # Only ever updates: a missing row means the owner or category is being deleted
+    apply_summary_delta(
+        instance.user_id, instance.category_id, difference({}, item_contribution(instance)), using=using, create=False
+    )
+
+
+# Connection reuse metrics for the database stats endpoint
+@receiver(connection_created)
+def count_new_connection(sender, connection, **kwargs):
+    connection_metrics.record_connection(connection.alias)
+
+@receiver(request_started)
+def count_request(sender, **kwargs):
+    connection_metrics.record_request()
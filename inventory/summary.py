@@ -0,0 +1,191 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+
+from .models import LOW_STOCK, CategorySummary, InventoryItem, InventorySummary
+
+COUNTERS = ('item_count', 'total_quantity', 'total_value', 'low_stock_count')
+LINE_VALUE = ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField(max_digits=20, decimal_places=2))
+AGGREGATES = {
+    'item_count': Count('id'),
+    'total_quantity': Sum('quantity'),
+    'total_value': Sum(LINE_VALUE),
+    'low_stock_count': Count('id', filter=LOW_STOCK),
+}
+
+
+# What one item adds to its owner's totals
+def contribution(quantity, price, low_stock_threshold):
+    return {
+        'item_count': 1,
+        'total_quantity': quantity,
+        'total_value': quantity * Decimal(price),
+        'low_stock_count': int(quantity <= low_stock_threshold),
+    }
+
+
+def item_contribution(item):
+    return contribution(item.quantity, item.price, item.low_stock_threshold)
+
+
+def difference(after, before):
+    return {name: after.get(name, 0) - before.get(name, 0) for name in COUNTERS}
+
+
+def _apply(model, lookup, delta, using, create):
+    updates = {name: F(name) + value for name, value in delta.items() if value}
+    if not updates:
+        return
+    queryset = model.objects.using(using).filter(**lookup)
+    if queryset.update(**updates) or not create:
+        return
+    try:
+        with transaction.atomic(using=using):
+            model.objects.using(using).create(**lookup, **delta)
+    except IntegrityError:
+        # Created by a concurrent writer in the meantime
+        queryset.update(**updates)
+
+
+# Add a delta to the user's totals and to the totals of one of their categories.
+# With create=False missing rows are left alone: when an item goes because its
+# owner or category is deleted, the cascade has already removed their summary
+# rows and re-creating them would point at rows about to disappear.
+def apply_summary_delta(user_id, category_id, delta, using='default', create=True):
+    if user_id is None:
+        return
+    _apply(InventorySummary, {'user_id': user_id}, delta, using, create)
+    if category_id is not None:
+        _apply(CategorySummary, {'user_id': user_id, 'category_id': category_id}, delta, using, create)
+
+
+# A stock movement only changes the quantity, and with it the value and possibly the low-stock flag
+def stock_movement_delta(item, previous_quantity, new_quantity):
+    before = contribution(previous_quantity, item.price, item.low_stock_threshold)
+    after = contribution(new_quantity, item.price, item.low_stock_threshold)
+    return difference(after, before)
+
+
+# Call after the stock UPDATE: the item row is locked before the summary rows
+def apply_stock_movement(item, previous_quantity, new_quantity, using='default'):
+    apply_summary_delta(item.user_id, item.category_id, stock_movement_delta(item, previous_quantity, new_quantity), using=using)
+
+
+# Totals computed from scratch with grouped queries, as {user_id: {...}} and {(user_id, category_id): {...}}
+def compute_summaries(user_ids=None, using='default'):
+    items = InventoryItem.objects.using(using).order_by()
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+
+    totals = {
+        row.pop('user_id'): row
+        for row in items.values('user_id').annotate(**AGGREGATES)
+    }
+    category_totals = {
+        (row.pop('user_id'), row.pop('category_id')): row
+        for row in items.values('user_id', 'category_id').annotate(**AGGREGATES)
+    }
+    return totals, category_totals
+
+
+# Totals of a set of one user's items per category, as {category_id: {...}}
+def category_totals_of(items, using='default'):
+    rows = items.using(using).order_by().values('category_id').annotate(**AGGREGATES)
+    return {row.pop('category_id'): _normalise(row) for row in rows}
+
+
+# Apply what a set write changed, from its items' totals taken before and after it.
+# The items must stay locked from before the first read until the deltas are in,
+# so concurrent changes to them are counted exactly once.
+def apply_category_totals_change(user_id, before, after, using='default'):
+    for category_id in sorted(before.keys() | after.keys()):
+        delta = difference(after.get(category_id, {}), before.get(category_id, {}))
+        apply_summary_delta(user_id, category_id, delta, using=using)
+
+
+def _normalise(row):
+    return {
+        'item_count': row.get('item_count') or 0,
+        'total_quantity': row.get('total_quantity') or 0,
+        'total_value': Decimal(row.get('total_value') or 0).quantize(Decimal('0.01')),
+        'low_stock_count': row.get('low_stock_count') or 0,
+    }
+
+
+# Replace the stored summaries with freshly computed ones
+def rebuild_summaries(user_ids=None, using='default'):
+    totals, category_totals = compute_summaries(user_ids, using=using)
+    with transaction.atomic(using=using):
+        summaries = InventorySummary.objects.using(using)
+        category_summaries = CategorySummary.objects.using(using)
+        if user_ids is not None:
+            summaries = summaries.filter(user_id__in=user_ids)
+            category_summaries = category_summaries.filter(user_id__in=user_ids)
+        summaries.delete()
+        category_summaries.delete()
+
+        InventorySummary.objects.using(using).bulk_create(
+            [InventorySummary(user_id=user_id, **_normalise(row)) for user_id, row in totals.items()],
+            batch_size=1000,
+        )
+        CategorySummary.objects.using(using).bulk_create(
+            [
+                CategorySummary(user_id=user_id, category_id=category_id, **_normalise(row))
+                for (user_id, category_id), row in category_totals.items()
+            ],
+            batch_size=1000,
+        )
+    return len(totals), len(category_totals)
+
+
+# Compare the stored summaries with freshly computed ones and return the differences
+def verify_summaries(user_ids=None, using='default'):
+    totals, category_totals = compute_summaries(user_ids, using=using)
+    summaries = InventorySummary.objects.using(using).values('user_id', *COUNTERS)
+    category_summaries = CategorySummary.objects.using(using).values('user_id', 'category_id', *COUNTERS)
+    if user_ids is not None:
+        summaries = summaries.filter(user_id__in=user_ids)
+        category_summaries = category_summaries.filter(user_id__in=user_ids)
+
+    stored = {row.pop('user_id'): row for row in summaries}
+    stored_categories = {(row.pop('user_id'), row.pop('category_id')): row for row in category_summaries}
+
+    mismatches = []
+    for kind, expected, actual in (('user', totals, stored), ('category', category_totals, stored_categories)):
+        for key in expected.keys() | actual.keys():
+            want = _normalise(expected.get(key, {}))
+            have = _normalise(actual.get(key, {}))
+            if want != have:
+                mismatches.append({'kind': kind, 'key': key, 'expected': want, 'stored': have})
+    return mismatches
+
+
+# Dashboard totals for one user, read from the summary tables in two small queries
+def read_summary(user_id, using=None):
+    totals = (
+        InventorySummary.objects.using(using).filter(user_id=user_id).values(*COUNTERS).first()
+        or _normalise({})
+    )
+    categories = (
+        CategorySummary.objects.using(using)
+        .filter(user_id=user_id, item_count__gt=0)
+        .order_by('category__name')
+        .values('category_id', 'category__name', *COUNTERS)
+    )
+    return {
+        "total_inventory_value": totals['total_value'],
+        "total_items_in_stock": totals['item_count'],
+        "total_quantity": totals['total_quantity'],
+        "low_stock_count": totals['low_stock_count'],
+        "category_totals": [
+            {
+                "category_id": row['category_id'],
+                "category": row['category__name'],
+                "item_count": row['item_count'],
+                "total_quantity": row['total_quantity'],
+                "total_value": row['total_value'],
+                "low_stock_count": row['low_stock_count'],
+            } for row in categories
+        ],
+    }
@@ -1,3 +1,1252 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import math
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipUnless
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .forecasting import apply_reorder_points, forecast_demand
+from .importer import import_inventory
+from .models import (Category, CategorySummary, CustomUser, InventoryChange, InventoryItem, InventorySummary, Notification,
+                     Profile, StockMovementRollup, Supplier)
+from .notifications import adjust_unread_count, dispatcher, mark_all_read, set_read
+from .routers import ReplicaRoutingMiddleware
+from .rollups import backfill_rollups, bucket_start
+from .serializers import TokenObtainPairWithClaimsSerializer
+from .services import InsufficientStock, bulk_update_items, record_changes_bulk, stock_delta
+from .summary import COUNTERS, rebuild_summaries, verify_summaries
+
+# Second alias for the replica routing tests. Like the aliases DB_REPLICA_HOSTS
+# adds, it mirrors the default database; it has to exist before the test
+# databases are set up, so it is added when this module is imported.
+TEST_REPLICA = 'test_replica'
+connections.settings.setdefault(TEST_REPLICA, {
+    **connections.settings[DEFAULT_DB_ALIAS],
+    'TEST': {**connections.settings[DEFAULT_DB_ALIAS]['TEST'], 'MIRROR': DEFAULT_DB_ALIAS},
+})
+
+
+# INDEX USAGE (PostgreSQL)
+# The main per-user access paths must be answered from the composite indexes
+# (migrations 0014-0016) on a dataset large enough for the planner to prefer them.
+@skipUnless(connection.vendor == 'postgresql', 'Needs PostgreSQL')
+class IndexUsageTests(TestCase):
+    users = 50
+    items_per_user = 200
+
+    @classmethod
+    def setUpTestData(cls):
+        users = CustomUser.objects.bulk_create([
+            CustomUser(username=f'user{number}', email=f'user{number}@example.com') for number in range(cls.users)
+        ])
+        category = Category.objects.create(name='Tools')
+        items = InventoryItem.objects.bulk_create([
+            InventoryItem(user=user, name=f'Item {number}', category=category, price='1.00', quantity=number % 40)
+            for user in users
+            for number in range(cls.items_per_user)
+        ], batch_size=2000)
+        InventoryChange.objects.bulk_create([
+            InventoryChange(item=item, user=item.user, change_type=change_type, quantity_change=1,
+                            previous_quantity=0, new_quantity=1)
+            for item in items
+            for change_type in ('RESTOCK', 'RETURN')
+        ], batch_size=2000)
+        Notification.objects.bulk_create([
+            Notification(user=user, message=f'Note {number}', is_read=number % 10 != 0)
+            for user in users
+            for number in range(cls.items_per_user)
+        ], batch_size=2000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.user = users[0]
+        cls.item = items[0]
+
+    def assertIndexScan(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+        self.assertNotIn(f'Seq Scan on {queryset.model._meta.db_table}', plan)
+
+    def test_item_list(self):
+        queryset = InventoryItem.objects.filter(user=self.user).order_by('-updated_at', '-id')[:101]
+        self.assertIndexScan(queryset, 'item_user_updated_idx')
+
+    def test_low_stock_items(self):
+        queryset = InventoryItem.objects.filter(user=self.user).low_stock().order_by('-updated_at', '-id')[:101]
+        self.assertIndexScan(queryset, 'item_user_low_stock_idx')
+
+    def test_change_log(self):
+        queryset = InventoryChange.objects.filter(user=self.user).order_by('-change_date', '-id')[:101]
+        self.assertIndexScan(queryset, 'change_user_date_idx')
+
+    def test_item_history(self):
+        queryset = InventoryChange.objects.filter(item=self.item).order_by('-change_date')
+        self.assertIndexScan(queryset, 'change_item_date_idx')
+
+    def test_notification_feed(self):
+        queryset = Notification.objects.filter(user=self.user).order_by('-created_at')[:101]
+        self.assertIndexScan(queryset, 'notif_user_created_idx')
+
+    def test_unread_notifications(self):
+        queryset = Notification.objects.filter(user=self.user, is_read=False).order_by('-created_at')[:101]
+        self.assertIndexScan(queryset, 'notif_user_unread_idx')
+
+
+class StockMutationTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        category = Category.objects.create(name='Tools')
+        self.item = InventoryItem.objects.create(user=self.user, name='Hammer', category=category, price='2.00', quantity=20)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def quantity(self):
+        return InventoryItem.objects.values_list('quantity', flat=True).get(pk=self.item.pk)
+
+    def test_delta_sign_follows_change_type(self):
+        self.assertEqual(stock_delta('SALE', 3), -3)
+        self.assertEqual(stock_delta('DAMAGE', -3), -3)
+        self.assertEqual(stock_delta('RESTOCK', -3), 3)
+        self.assertEqual(stock_delta('RETURN', 3), 3)
+
+    def test_change_fills_quantities_from_update(self):
+        change = InventoryChange.objects.create(item=self.item, user=self.user, change_type='SALE', quantity_change=5)
+
+        self.assertEqual((change.previous_quantity, change.new_quantity), (20, 15))
+        self.assertEqual(self.quantity(), 15)
+
+    def test_insufficient_stock(self):
+        response = self.client.post(
+            '/api/v1/inventory-changes/', {'item': self.item.pk, 'change_type': 'SALE', 'quantity_change': -21}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+        # Also when the serializer's check passed on a stale quantity
+        with self.assertRaises(InsufficientStock):
+            InventoryChange.objects.create(item=self.item, user=self.user, change_type='SALE', quantity_change=-21)
+        self.assertEqual(self.quantity(), 20)
+
+    def test_resaving_change_does_not_move_stock(self):
+        change = InventoryChange.objects.create(item=self.item, user=self.user, change_type='RESTOCK', quantity_change=5)
+        change.reason = 'Corrected reason'
+        change.save()
+
+        self.assertEqual(self.quantity(), 25)
+
+
+class BulkChangeEndpointTests(TestCase):
+    url = '/api/v1/inventory-changes/bulk/'
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        category = Category.objects.create(name='Tools')
+        self.item = InventoryItem.objects.create(user=self.user, name='Hammer', category=category, price='2.00', quantity=10)
+        other = CustomUser.objects.create_user(username='other', email='other@example.com', password='pw')
+        self.foreign_item = InventoryItem.objects.create(user=other, name='Saw', category=category, price='9.00', quantity=10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, rows):
+        return self.client.post(self.url, {'changes': rows}, format='json')
+
+    def test_changes_apply_in_order(self):
+        response = self.post([
+            {'item': self.item.pk, 'change_type': 'SALE', 'quantity_change': -4},
+            {'item': self.item.pk, 'change_type': 'RESTOCK', 'quantity_change': 6},
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([(row['previous_quantity'], row['new_quantity']) for row in response.data['results']],
+                         [(10, 6), (6, 12)])
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 12)
+        self.assertEqual(InventoryChange.objects.filter(item=self.item, change_type='SALE').count(), 1)
+
+    def test_partial_failure(self):
+        response = self.post([
+            {'item': self.item.pk, 'change_type': 'RESTOCK', 'quantity_change': 1},
+            {'item': self.foreign_item.pk, 'change_type': 'SALE', 'quantity_change': -1},
+            {'item': self.item.pk, 'change_type': 'SALE', 'quantity_change': 0},
+        ])
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 2))
+        self.assertEqual([row['status'] for row in response.data['results']], ['created', 'error', 'error'])
+        self.foreign_item.refresh_from_db()
+        self.assertEqual(self.foreign_item.quantity, 10)
+
+    def test_sequence_dipping_below_zero_is_rejected(self):
+        response = self.post([
+            {'item': self.item.pk, 'change_type': 'SALE', 'quantity_change': -11},
+            {'item': self.item.pk, 'change_type': 'RESTOCK', 'quantity_change': 5},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 10)
+        self.assertFalse(InventoryChange.objects.filter(change_type='SALE').exists())
+
+    def test_query_count_does_not_grow_with_rows(self):
+        counts = []
+        for size in (2, 20):
+            with CaptureQueriesContext(connection) as queries:
+                self.post([{'item': self.item.pk, 'change_type': 'RESTOCK', 'quantity_change': 1}] * size)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_rejects_oversized_batch(self):
+        rows = [{'item': self.item.pk, 'change_type': 'RESTOCK', 'quantity_change': 1}] * 5001
+        self.assertEqual(self.post(rows).status_code, 400)
+
+
+class InventoryImportTests(TestCase):
+    url = '/api/v1/inventory/import/'
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        Category.objects.create(name='Tools')
+        Supplier.objects.create(user=self.user, name='Acme', email='sales@acme.test')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, name, content, **data):
+        return self.client.post(self.url, {'file': SimpleUploadedFile(name, content.encode()), **data}, format='multipart')
+
+    def summary(self):
+        return InventorySummary.objects.values_list(*COUNTERS).get(user=self.user)
+
+    def test_csv_import(self):
+        response = self.upload('items.csv', (
+            "name,category,supplier,quantity,price,low_stock_threshold,barcode\n"
+            "Hammer,Tools,Acme,20,2.50,5,H-1\n"
+            "Chisel,Tools,,5,4.00,5,\n"
+        ))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['low_stock']), (2, 1))
+        hammer = InventoryItem.objects.get(user=self.user, name='Hammer')
+        self.assertEqual((hammer.quantity, hammer.supplier.name, hammer.barcode), (20, 'Acme', 'H-1'))
+        self.assertEqual(InventoryChange.objects.filter(item__user=self.user, change_type='RESTOCK').count(), 2)
+        self.assertTrue(StockMovementRollup.objects.filter(item=hammer, change_type='RESTOCK', quantity=20).exists())
+
+        # Summaries written by delta match a rebuild from the items
+        imported = self.summary()
+        rebuild_summaries([self.user.pk])
+        self.assertEqual(self.summary(), imported)
+
+    def test_ndjson_rows_fail_individually(self):
+        lines = [
+            json.dumps({'name': 'Hammer', 'category': 'Tools', 'price': '2.50', 'barcode': 'H-1'}),
+            'not json',
+            json.dumps({'name': 'Mallet', 'category': 'Garden', 'price': '3.00'}),
+            json.dumps({'name': 'Sledge', 'category': 'Tools', 'price': '9.00', 'barcode': 'H-1'}),
+        ]
+        response = self.upload('items.ndjson', '\n'.join(lines))
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 3))
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3, 4])
+        self.assertEqual(list(InventoryItem.objects.filter(user=self.user).values_list('name', flat=True)), ['Hammer'])
+
+    def test_barcode_taken_during_import_fails_only_its_row(self):
+        def rows():
+            yield {'name': 'Hammer', 'category': 'Tools', 'price': '2.50', 'barcode': 'H-1'}, None
+            # A concurrent import takes the barcode after the row was checked
+            InventoryItem.objects.create(user=self.user, name='Mallet', category=Category.objects.get(name='Tools'),
+                                         price='3.00', barcode='H-1')
+            yield {'name': 'Chisel', 'category': 'Tools', 'price': '4.00', 'quantity': 12}, None
+
+        result = import_inventory(self.user, rows())
+
+        self.assertEqual((result['created'], result['failed']), (1, 1))
+        self.assertEqual(result['errors'][0]['row'], 1)
+        self.assertIn('barcode', result['errors'][0]['errors'])
+        self.assertEqual(sorted(InventoryItem.objects.filter(user=self.user).values_list('name', flat=True)), ['Chisel', 'Mallet'])
+        self.assertEqual(verify_summaries([self.user.pk]), [])
+
+    def test_dry_run_writes_nothing(self):
+        response = self.upload('items.csv', "name,category,price\nHammer,Tools,2.50\n", dry_run='true')
+
+        self.assertEqual((response.status_code, response.data['created']), (200, 1))
+        self.assertFalse(InventoryItem.objects.filter(user=self.user).exists())
+
+    def test_rejects_unknown_format(self):
+        self.assertEqual(self.upload('items.xlsx', 'name').status_code, 400)
+
+
+class BulkItemEndpointTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.tools = Category.objects.create(name='Tools')
+        self.hammer = InventoryItem.objects.create(user=self.user, name='Hammer', category=self.tools, price='2.00',
+                                                   quantity=20, low_stock_threshold=5)
+        self.chisel = InventoryItem.objects.create(user=self.user, name='Chisel', category=self.tools, price='4.00',
+                                                   quantity=5, low_stock_threshold=5)
+        other = CustomUser.objects.create_user(username='other', email='other@example.com', password='pw')
+        self.saw = InventoryItem.objects.create(user=other, name='Saw', category=self.tools, price='9.00', quantity=10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def summary(self):
+        return InventorySummary.objects.values_list(*COUNTERS).get(user=self.user)
+
+    def test_update_by_ids(self):
+        response = self.client.post('/api/v1/inventory/bulk-update/', {
+            'ids': [self.hammer.pk, self.saw.pk], 'patch': {'price_multiplier': '1.5'},
+        }, format='json')
+
+        self.assertEqual((response.status_code, response.data['updated']), (200, 1))
+        self.assertEqual(
+            dict(InventoryItem.objects.values_list('name', 'price')),
+            {'Hammer': Decimal('3.00'), 'Chisel': Decimal('4.00'), 'Saw': Decimal('9.00')},
+        )
+        self.assertEqual(self.summary()[2], Decimal('80.00'))
+
+    def test_update_by_filter(self):
+        response = self.client.post('/api/v1/inventory/bulk-update/', {
+            'filter': {'low_stock': 'true'}, 'patch': {'low_stock_threshold': 2},
+        }, format='json')
+
+        self.assertEqual(response.data['updated'], 1)
+        self.chisel.refresh_from_db()
+        self.assertEqual(self.chisel.low_stock_threshold, 2)
+        self.assertEqual(self.summary()[3], 0)
+
+    def test_summaries_stay_exact(self):
+        parts = Category.objects.create(name='Parts')
+        bolt = InventoryItem.objects.create(user=self.user, name='Bolt', category=parts, price='0.10', quantity=100)
+
+        self.client.post('/api/v1/inventory/bulk-update/', {
+            'ids': [self.chisel.pk], 'patch': {'category': parts.pk, 'price_multiplier': '2'},
+        }, format='json')
+        self.assertEqual(verify_summaries([self.user.pk]), [])
+
+        self.client.post('/api/v1/inventory/bulk-delete/', {'ids': [bolt.pk, self.chisel.pk]}, format='json')
+        self.assertEqual(verify_summaries([self.user.pk]), [])
+
+    # Summaries are moved by the batch's delta, not recomputed, so rows it doesn't cover stay as stored
+    def test_summaries_outside_the_batch_are_not_rewritten(self):
+        parts = Category.objects.create(name='Parts')
+        InventoryItem.objects.create(user=self.user, name='Bolt', category=parts, price='0.10', quantity=100)
+        CategorySummary.objects.filter(user=self.user, category=parts).update(total_quantity=999)
+
+        self.client.post('/api/v1/inventory/bulk-update/', {'ids': [self.hammer.pk], 'patch': {'price': '3.00'}}, format='json')
+
+        self.assertEqual(CategorySummary.objects.get(user=self.user, category=parts).total_quantity, 999)
+        self.assertEqual(CategorySummary.objects.get(user=self.user, category=self.tools).total_value, Decimal('80.00'))
+
+    def test_unknown_filter_is_rejected(self):
+        response = self.client.post('/api/v1/inventory/bulk-update/', {
+            'filter': {'categroy': self.tools.pk}, 'patch': {'price': '1.00'},
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(InventoryItem.objects.filter(price='1.00').exists())
+
+    def test_delete_by_filter(self):
+        InventoryChange.objects.create(item=self.hammer, user=self.user, change_type='SALE', quantity_change=-1)
+
+        response = self.client.post('/api/v1/inventory/bulk-delete/', {'filter': {'category': self.tools.pk}}, format='json')
+
+        self.assertEqual(response.data['deleted'], 2)
+        self.assertEqual(list(InventoryItem.objects.values_list('name', flat=True)), ['Saw'])
+        self.assertFalse(InventoryChange.objects.filter(user=self.user).exists())
+        self.assertFalse(StockMovementRollup.objects.filter(user=self.user, item__isnull=False).exists())
+        self.assertFalse(InventorySummary.objects.filter(user=self.user, item_count__gt=0).exists())
+
+
+class InventoryReportTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        tools, parts = Category.objects.create(name='Tools'), Category.objects.create(name='Parts')
+        hammer = InventoryItem.objects.create(user=self.user, name='Hammer', category=tools, price='2.50', quantity=20,
+                                              low_stock_threshold=5)
+        bolt = InventoryItem.objects.create(user=self.user, name='Bolt', category=parts, price='0.10', quantity=100)
+        InventoryItem.objects.create(user=self.user, name='Nut', category=parts, price='0.05', quantity=10)
+        other = CustomUser.objects.create_user(username='other', email='other@example.com', password='pw')
+        InventoryItem.objects.create(user=other, name='Saw', category=tools, price='9.00', quantity=10)
+
+        InventoryChange.objects.create(item=hammer, user=self.user, change_type='SALE', quantity_change=-16)
+        InventoryChange.objects.create(item=bolt, user=self.user, change_type='RESTOCK', quantity_change=50)
+        hammer.refresh_from_db()
+        hammer.price = Decimal('3.00')
+        hammer.save()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_totals_match_the_items(self):
+        report = self.client.get('/api/v1/inventory-report/').json()
+
+        items = InventoryItem.objects.filter(user=self.user)
+        self.assertEqual(Decimal(report['total_inventory_value']), sum(item.quantity * item.price for item in items))
+        self.assertEqual(report['total_items_in_stock'], len(items))
+        self.assertEqual(sorted(report['low_stock_items']), ['Hammer', 'Nut'])
+        self.assertEqual(report['low_stock_count'], 2)
+        self.assertEqual(
+            {row['category']: (row['item_count'], row['total_quantity']) for row in report['category_totals']},
+            {'Parts': (2, 160), 'Tools': (1, 4)},
+        )
+        self.assertEqual({row['name']: row['quantity'] for row in report['stock_levels']}, {'Hammer': 4, 'Bolt': 150, 'Nut': 10})
+
+
+class ReportHistoryTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        category = Category.objects.create(name='Tools')
+        hammer = InventoryItem.objects.create(user=self.user, name='Hammer', category=category, price='2.00', quantity=20)
+        InventoryChange.objects.create(item=hammer, user=self.user, change_type='SALE', quantity_change=-3, reason='Counter')
+        other = CustomUser.objects.create_user(username='other', email='other@example.com', password='pw')
+        InventoryItem.objects.create(user=other, name='Saw', category=category, price='9.00', quantity=10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def history(self, **params):
+        response = self.client.get('/api/v1/inventory-report/history/', params)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_streams_own_changes_newest_first(self):
+        self.assertEqual(
+            [(row['item'], row['type'], row['from'], row['to']) for row in self.history()],
+            [('Hammer', 'SALE', 20, 17), ('Hammer', 'RESTOCK', 0, 20)],
+        )
+
+    def test_date_range(self):
+        self.assertEqual(self.history(end='2000-01-01'), [])
+        self.assertEqual(len(self.history(start=timezone.localdate().isoformat())), 2)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        category = Category.objects.create(name='Tools')
+        self.hammer = InventoryItem.objects.create(user=self.user, name='Hammer', category=category, price='2.50',
+                                                   quantity=20, description='Claw, 16 oz\n"steel"')
+        InventoryItem.objects.create(user=self.user, name='Chisel', category=category, price='4.00', quantity=10)
+        other = CustomUser.objects.create_user(username='other', email='other@example.com', password='pw')
+        InventoryItem.objects.create(user=other, name='Saw', category=category, price='9.00', quantity=10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, path, **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_items(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('/api/v1/export/inventory/'))))
+
+        self.assertEqual([row['name'] for row in rows], ['Chisel', 'Hammer'])
+        hammer = rows[1]
+        self.assertEqual((hammer['description'], hammer['category'], hammer['price']), (self.hammer.description, 'Tools', '2.50'))
+
+    def test_ndjson_changes_with_filter(self):
+        InventoryChange.objects.create(item=self.hammer, user=self.user, change_type='SALE', quantity_change=-2)
+
+        content = self.export('/api/v1/export/inventory-changes/', file_format='ndjson', change_type='SALE')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([(row['item_name'], row['previous_quantity'], row['new_quantity']) for row in rows], [('Hammer', 20, 18)])
+
+    def test_low_stock_only(self):
+        content = self.export('/api/v1/export/inventory/', file_format='ndjson', low_stock='true')
+        self.assertEqual([json.loads(line)['name'] for line in content.splitlines()], ['Chisel'])
+
+    def test_rejects_unknown_format(self):
+        self.assertEqual(self.client.get('/api/v1/export/inventory/', {'file_format': 'xlsx'}).status_code, 400)
+
+
+# Real concurrent transactions need a database server, SQLite serializes writers
+@skipUnless(connection.vendor == 'postgresql', 'Needs PostgreSQL')
+@override_settings(NOTIFICATIONS={'ASYNC': False})
+class ConcurrentSalesTests(TransactionTestCase):
+    threads = 20
+    sales_per_thread = 10
+
+    def test_no_lost_updates(self):
+        user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        category = Category.objects.create(name='Tools')
+        stock = self.threads * self.sales_per_thread - 50
+        item = InventoryItem.objects.create(user=user, name='Hammer', category=category, price='2.00', quantity=stock)
+        refused = []
+
+        def sell():
+            try:
+                for _ in range(self.sales_per_thread):
+                    try:
+                        InventoryChange.objects.create(item=item, user=user, change_type='SALE', quantity_change=-1)
+                    except InsufficientStock:
+                        refused.append(1)
+            finally:
+                # Each thread has its own connection, persistent ones would outlive the test
+                connection.close()
+
+        workers = [threading.Thread(target=sell) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 0)
+        self.assertEqual(len(refused), 50)
+        self.assertEqual(InventoryChange.objects.filter(item=item, change_type='SALE').count(), stock)
+
+
+# Summary deltas of changes committed while a bulk update runs must not be lost
+@skipUnless(connection.vendor == 'postgresql', 'Needs PostgreSQL')
+@override_settings(NOTIFICATIONS={'ASYNC': False})
+class ConcurrentBulkUpdateTests(TransactionTestCase):
+    def test_summaries_stay_exact(self):
+        user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        category = Category.objects.create(name='Tools')
+        items = [
+            InventoryItem.objects.create(user=user, name=f'Item {number}', category=category, price='2.00', quantity=500)
+            for number in range(5)
+        ]
+
+        def sell(item):
+            try:
+                for _ in range(20):
+                    InventoryChange.objects.create(item=item, user=user, change_type='SALE', quantity_change=-1)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=sell, args=(item,)) for item in items]
+        for worker in workers:
+            worker.start()
+        for _ in range(10):
+            bulk_update_items(user.pk, InventoryItem.objects.filter(user=user), {'price_multiplier': Decimal('1.01')})
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(verify_summaries([user.pk]), [])
+
+
+class SummaryDeleteTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.category = Category.objects.create(name='Tools')
+        self.other = Category.objects.create(name='Parts')
+        for name, category in [('Hammer', self.category), ('Saw', self.category), ('Bolt', self.other)]:
+            InventoryItem.objects.create(user=self.user, name=name, category=category, price='2.00', quantity=5)
+
+    def test_delete_category_with_items(self):
+        self.category.delete()
+
+        self.assertFalse(CategorySummary.objects.filter(category_id=self.category.pk).exists())
+        summary = InventorySummary.objects.get(user=self.user)
+        self.assertEqual((summary.item_count, summary.total_quantity), (1, 5))
+
+    def test_delete_user_with_items(self):
+        self.user.delete()
+
+        self.assertFalse(InventorySummary.objects.exists())
+        self.assertFalse(CategorySummary.objects.exists())
+
+
+class BulkChangeSummaryTests(TestCase):
+    def test_summaries_follow_batch(self):
+        user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        tools, parts = Category.objects.create(name='Tools'), Category.objects.create(name='Parts')
+        hammer = InventoryItem.objects.create(user=user, name='Hammer', category=tools, price='2.00', quantity=5)
+        bolt = InventoryItem.objects.create(user=user, name='Bolt', category=parts, price='1.00', quantity=20)
+
+        results = record_changes_bulk(user, [
+            (0, {'item': bolt.pk, 'change_type': 'SALE', 'quantity_change': 15}),
+            (1, {'item': hammer.pk, 'change_type': 'RESTOCK', 'quantity_change': 3}),
+            (2, {'item': hammer.pk, 'change_type': 'SALE', 'quantity_change': 20}),
+        ])
+
+        self.assertEqual([result['status'] for result in results], ['created', 'error', 'error'])
+        summary = InventorySummary.objects.get(user=user)
+        self.assertEqual((summary.total_quantity, summary.total_value, summary.low_stock_count), (10, 15, 2))
+        bolts = CategorySummary.objects.get(user=user, category=parts)
+        self.assertEqual((bolts.total_quantity, bolts.low_stock_count), (5, 1))
+
+
+# QUERY COUNTS PER ENDPOINT
+# Each endpoint runs a fixed number of queries whatever the page size or the
+# number of rows, so a serializer field reaching into an unjoined relation
+# (N+1) fails here.
+class QueryCountTests(TestCase):
+    page_sizes = (2, 10)
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw', is_staff=True)
+        self.categories = [Category.objects.create(name=f'Category {number}') for number in range(2)]
+        self.suppliers = [
+            Supplier.objects.create(user=self.user, name=f'Supplier {number}', email=f'supplier{number}@example.com')
+            for number in range(12)
+        ]
+        self.add_items(12)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_items(self, count):
+        start = InventoryItem.objects.count()
+        for number in range(start, start + count):
+            item = InventoryItem.objects.create(
+                user=self.user, name=f'Item {number}', category=self.categories[number % 2],
+                supplier=self.suppliers[number % 3], price='1.00', quantity=20,
+            )
+            InventoryChange.objects.create(item=item, user=self.user, change_type='SALE', quantity_change=-1)
+            Notification.objects.create(user=self.user, message=f'Note {number}')
+
+    def assertQueriesPerPage(self, url, expected):
+        for page_size in self.page_sizes:
+            with self.subTest(page_size=page_size), self.assertNumQueries(expected):
+                response = self.client.get(f'{url}?page_size={page_size}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['results']), page_size)
+
+    def assertQueriesPerDataset(self, url, expected):
+        for _ in range(2):
+            with self.assertNumQueries(expected):
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.add_items(5)
+
+    def test_item_lists(self):
+        self.assertQueriesPerPage('/api/v1/inventory/user/', 3)
+        self.assertQueriesPerPage('/api/v1/inventories/', 3)
+
+    def test_supplier_list(self):
+        self.assertQueriesPerPage('/api/v1/suppliers/', 3)
+
+    def test_change_log(self):
+        self.assertQueriesPerPage('/api/v1/inventory-changes/', 2)
+
+    def test_notifications(self):
+        self.assertQueriesPerPage('/api/v1/notifications/', 1)
+
+    def test_report_and_summary(self):
+        self.assertQueriesPerDataset('/api/v1/inventory-report/', 4)
+        self.assertQueriesPerDataset('/api/v1/inventory-summary/', 2)
+
+    def test_details(self):
+        item = InventoryItem.objects.first()
+        change = InventoryChange.objects.first()
+        for url, expected in [
+            (f'/api/v1/inventory/{item.pk}/', 2),
+            (f'/api/v1/inventory-changes/{change.pk}/', 1),
+            (f'/api/v1/supplier/{self.suppliers[0].pk}/', 2),
+            (f'/api/v1/category/{self.categories[0].pk}/', 2),
+        ]:
+            with self.subTest(url=url), self.assertNumQueries(expected):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class TenantCacheTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Tools')
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.item = InventoryItem.objects.create(user=self.user, name='Hammer', category=category, price='2.00', quantity=10)
+        other = CustomUser.objects.create_user(username='other', email='other@example.com', password='pw')
+        InventoryItem.objects.create(user=other, name='Saw', category=category, price='9.00', quantity=10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.other_client = APIClient()
+        self.other_client.force_authenticate(other)
+
+    def get(self, path, client=None):
+        response = (client or self.client).get(path)
+        self.assertEqual(response.status_code, 200)
+        return response['X-Cache'], response.json()
+
+    def test_repeated_read_is_a_hit(self):
+        cache_state, first = self.get('/api/v1/inventory/user/')
+        self.assertEqual(cache_state, 'MISS')
+        self.assertEqual(self.get('/api/v1/inventory/user/'), ('HIT', first))
+
+    def test_write_invalidates_only_the_owner(self):
+        self.get('/api/v1/inventory/user/')
+        self.get('/api/v1/inventory/user/', self.other_client)
+
+        self.item.name = 'Claw hammer'
+        self.item.save()
+
+        cache_state, data = self.get('/api/v1/inventory/user/')
+        self.assertEqual((cache_state, data['results'][0]['name']), ('MISS', 'Claw hammer'))
+        self.assertEqual(self.get('/api/v1/inventory/user/', self.other_client)[0], 'HIT')
+
+    def test_stock_change_invalidates_detail(self):
+        path = f'/api/v1/inventory/{self.item.pk}/'
+        self.get(path)
+
+        InventoryChange.objects.create(item=self.item, user=self.user, change_type='SALE', quantity_change=-3)
+
+        cache_state, data = self.get(path)
+        self.assertEqual((cache_state, data['quantity']), ('MISS', 7))
+
+    def test_category_write_invalidates_shared_list(self):
+        self.get('/api/v1/categories/')
+        self.assertEqual(self.get('/api/v1/categories/', self.other_client)[0], 'HIT')
+
+        Category.objects.create(name='Parts')
+
+        cache_state, data = self.get('/api/v1/categories/', self.other_client)
+        self.assertEqual(cache_state, 'MISS')
+        self.assertIn('Parts', [category['name'] for category in data['results']])
+
+
+class ConditionalRequestTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        category = Category.objects.create(name='Tools')
+        self.item = InventoryItem.objects.create(user=self.user, name='Hammer', category=category, price='2.00', quantity=5)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_if_modified_since_last_modified_is_not_modified(self):
+        response = self.client.get(f'/api/v1/inventory/{self.item.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(f'/api/v1/inventory/{self.item.pk}/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_unmodified_since_last_modified_allows_update(self):
+        last_modified = self.client.get(f'/api/v1/inventory/{self.item.pk}/')['Last-Modified']
+
+        response = self.client.patch(
+            f'/api/v1/inventory/{self.item.pk}/update/', {'name': 'Claw hammer'}, format='json',
+            HTTP_IF_UNMODIFIED_SINCE=last_modified,
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_unmodified_since_before_change_is_rejected(self):
+        response = self.client.patch(
+            f'/api/v1/inventory/{self.item.pk}/update/', {'name': 'Claw hammer'}, format='json',
+            HTTP_IF_UNMODIFIED_SINCE='Mon, 01 Jan 2001 00:00:00 GMT',
+        )
+        self.assertEqual(response.status_code, 412)
+
+    @override_settings(NOTIFICATIONS={'ASYNC': False})
+    def test_new_notification_changes_profile_etag(self):
+        response = self.client.get('/api/v1/profile/update/')
+        self.assertEqual((response.status_code, response.data['unread_notifications']), (200, 0))
+
+        dispatcher.dispatch([(self.user.pk, 'Restock the hammers', None)])
+
+        response = self.client.get('/api/v1/profile/update/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['unread_notifications'], 1)
+
+
+def access_token(user):
+    return str(TokenObtainPairWithClaimsSerializer.get_token(user).access_token)
+
+
+# Queries loading users (not the ones joining them to other rows)
+def user_queries(queries):
+    table = f'FROM {connection.ops.quote_name(CustomUser._meta.db_table)}'
+    return [query['sql'] for query in queries if table in query['sql']]
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token(self.user)}')
+
+    # An endpoint that only needs request.user.pk, so the user queries are the authentication's
+    def authenticate(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/notifications/')
+        return response, user_queries(queries)
+
+    def test_user_loaded_once(self):
+        response, queries = self.authenticate()
+        self.assertEqual((response.status_code, len(queries)), (200, 1))
+
+        response, queries = self.authenticate()
+        self.assertEqual((response.status_code, queries), (200, []))
+
+    def test_save_invalidates_cached_user(self):
+        self.authenticate()
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.first_name = 'Ada'
+        user.save()
+
+        response, queries = self.authenticate()
+        self.assertEqual((response.status_code, len(queries)), (200, 1))
+
+    # The cached copy is still served until the TTL runs out when the row changes without
+    # signals, a write through it must not put the old columns back
+    def test_patch_keeps_changes_made_after_caching(self):
+        self.authenticate()
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        response = self.client.patch('/api/v1/profile/', {'first_name': 'Ada'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        user = CustomUser.objects.get(pk=self.user.pk)
+        self.assertEqual((user.first_name, user.is_active), ('Ada', False))
+
+    def test_password_change_keeps_changes_made_after_caching(self):
+        self.authenticate()
+        CustomUser.objects.filter(pk=self.user.pk).update(email='new@example.com')
+
+        response = self.client.put('/api/v1/change-password/', {
+            'old_password': 'pw', 'new_password': 'A-l0nger-passw0rd', 'confirm_new_password': 'A-l0nger-passw0rd',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        user = CustomUser.objects.get(pk=self.user.pk)
+        self.assertEqual(user.email, 'new@example.com')
+        self.assertTrue(user.check_password('A-l0nger-passw0rd'))
+
+    def test_deactivated_user_is_rejected(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.authenticate()[0].status_code, 401)
+
+
+@override_settings(TOKEN_CLAIMS_AUTH=True)
+class TokenClaimsAuthTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        category = Category.objects.create(name='Tools')
+        InventoryItem.objects.create(user=self.user, name='Hammer', category=category, price='2.00', quantity=10)
+        other = CustomUser.objects.create_user(username='other', email='other@example.com', password='pw')
+        InventoryItem.objects.create(user=other, name='Saw', category=category, price='9.00', quantity=10)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token(self.user)}')
+
+    def get(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response, user_queries(queries)
+
+    def test_read_endpoints_never_load_the_user(self):
+        response, queries = self.get('/api/v1/inventory/user/')
+        self.assertEqual(([item['name'] for item in response.data['results']], queries), (['Hammer'], []))
+
+        for path in ('/api/v1/inventory-report/', '/api/v1/inventory-summary/', '/api/v1/notifications/'):
+            with self.subTest(path=path):
+                self.assertEqual(self.get(path)[1], [])
+
+    def test_other_endpoints_still_load_the_user(self):
+        self.assertEqual(len(self.get('/api/v1/inventory-changes/')[1]), 1)
+
+    def test_rejects_missing_token(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get('/api/v1/inventory/user/').status_code, 401)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        category = Category.objects.create(name='Tools')
+        for number in range(7):
+            InventoryItem.objects.create(user=self.user, name=f'Item {number}', category=category, price='1.00', quantity=20)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, field='name'):
+        names, pages = [], 0
+        while url:
+            payload = self.client.get(url).json()
+            names += [row[field] for row in payload['results']]
+            url, pages = payload['next'], pages + 1
+        return names, pages
+
+    def test_pages_cover_every_row_once(self):
+        names, pages = self.walk('/api/v1/inventory/user/?page_size=3')
+        self.assertEqual(pages, 3)
+        self.assertEqual(sorted(names), [f'Item {number}' for number in range(7)])
+
+    def test_rows_sharing_the_sort_key(self):
+        InventoryItem.objects.update(updated_at=timezone.now())
+        names, _ = self.walk('/api/v1/inventory/user/?page_size=2&count=false')
+        self.assertEqual(len(names), 7)
+        self.assertEqual(len(set(names)), 7)
+
+    def test_change_log_pages(self):
+        changes, pages = self.walk('/api/v1/inventory-changes/?page_size=4', field='id')
+        self.assertEqual((len(set(changes)), pages), (7, 2))
+
+
+@override_settings(NOTIFICATIONS={'ASYNC': False})
+class LowStockAlertTests(TestCase):
+    def test_rolled_back_change_does_not_silence_alert(self):
+        user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        category = Category.objects.create(name='Tools')
+        item = InventoryItem.objects.create(user=user, name='Hammer', category=category, price='2.00', quantity=20)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                InventoryChange.objects.create(item=item, user=user, change_type='SALE', quantity_change=-15)
+                raise RuntimeError
+        with self.captureOnCommitCallbacks(execute=True):
+            InventoryChange.objects.create(item=item, user=user, change_type='SALE', quantity_change=-15)
+
+        self.assertEqual(Notification.objects.filter(message__startswith='Low stock alert').count(), 1)
+
+
+class NotificationFlushTests(TransactionTestCase):
+    def test_bad_entry_does_not_drop_batch(self):
+        user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        gone = CustomUser.objects.create_user(username='gone', email='gone@example.com', password='pw')
+        entries = [(user.pk, 'First', None), (gone.pk, 'Lost', None), (user.pk, 'Second', None)]
+        gone.delete()
+
+        dispatcher._queue.put((entries, DEFAULT_DB_ALIAS))
+        with self.assertLogs('inventory.notifications', 'ERROR'):
+            dispatcher.flush()
+
+        self.assertEqual(sorted(Notification.objects.values_list('message', flat=True)), ['First', 'Second'])
+        user.profile.refresh_from_db()
+        self.assertEqual(user.profile.unread_notifications, 2)
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.notifications = [Notification.objects.create(user=self.user, message=f'Note {number}') for number in range(2)]
+        adjust_unread_count(self.user.pk, 2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def unread_count(self):
+        return Profile.objects.get(user=self.user).unread_notifications
+
+    def test_concurrent_mark_read_counts_once(self):
+        # Both requests loaded the row while it was still unread
+        first, second = (Notification.objects.get(pk=self.notifications[0].pk) for _ in range(2))
+        self.assertTrue(set_read(first, True))
+        self.assertFalse(set_read(second, True))
+        self.assertEqual(self.unread_count(), 1)
+
+    def test_patch_and_delete(self):
+        url = f'/api/v1/notifications/{self.notifications[0].pk}/'
+        for _ in range(2):
+            self.assertEqual(self.client.patch(url, {'is_read': True}, format='json').status_code, 200)
+        self.assertEqual(self.unread_count(), 1)
+
+        self.client.delete(f'{url}delete/')
+        self.assertEqual(self.unread_count(), 1)
+
+    def test_counter_moves_profile_validator(self):
+        before = Profile.objects.get(user=self.user).updated_at
+        mark_all_read(self.user.pk)
+        self.assertGreater(Profile.objects.get(user=self.user).updated_at, before)
+
+    def test_mark_all_read_keeps_other_increments(self):
+        # A notification being written concurrently has already counted itself
+        adjust_unread_count(self.user.pk, 1)
+        self.assertEqual(mark_all_read(self.user.pk), 2)
+        self.assertEqual(self.unread_count(), 1)
+
+
+class NotificationStreamTests(TestCase):
+    def test_not_served_under_wsgi(self):
+        response = self.client.get('/api/v1/notifications/stream/')
+        self.assertEqual(response.status_code, 501)
+
+    async def test_served_under_asgi(self):
+        response = await self.async_client.get('/api/v1/notifications/stream/')
+        # Past the WSGI guard, stopped by the missing token
+        self.assertEqual(response.status_code, 401)
+
+
+class StockMovementRollupTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        category = Category.objects.create(name='Tools')
+        self.hammer = InventoryItem.objects.create(user=self.user, name='Hammer', category=category, price='2.00', quantity=50)
+        self.saw = InventoryItem.objects.create(user=self.user, name='Saw', category=category, price='9.00', quantity=50)
+        InventoryChange.objects.create(item=self.hammer, user=self.user, change_type='SALE', quantity_change=-3)
+        InventoryChange.objects.create(item=self.hammer, user=self.user, change_type='SALE', quantity_change=-2)
+        record_changes_bulk(self.user, [
+            (0, {'item': self.saw.pk, 'change_type': 'SALE', 'quantity_change': -4}),
+            (1, {'item': self.saw.pk, 'change_type': 'RETURN', 'quantity_change': 1}),
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def rollups(self):
+        return sorted(StockMovementRollup.objects.filter(user=self.user).values_list(
+            'item_id', 'change_type', 'granularity', 'bucket_start', 'quantity', 'change_count'
+        ), key=repr)
+
+    def test_incremental_rollups_match_backfill(self):
+        incremental = self.rollups()
+        backfill_rollups([self.user.pk])
+        self.assertEqual(self.rollups(), incremental)
+
+    # Summed, the changes may straddle a bucket boundary
+    def totals(self, series):
+        return sum(row['quantity'] for row in series), sum(row['changes'] for row in series)
+
+    def test_series_endpoint(self):
+        response = self.client.get('/api/v1/analytics/movements/', {'change_type': 'sale'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.totals(response.data['series']), (9, 3))
+
+        response = self.client.get('/api/v1/analytics/movements/',
+                                   {'granularity': 'hour', 'item': self.hammer.pk, 'change_type': 'SALE'})
+        self.assertEqual(self.totals(response.data['series']), (5, 2))
+
+    def test_rejects_unknown_granularity(self):
+        self.assertEqual(self.client.get('/api/v1/analytics/movements/', {'granularity': 'week'}).status_code, 400)
+
+
+class ForecastTests(TestCase):
+    history_days = 30
+    window_days = 14
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        category = Category.objects.create(name='Tools')
+        self.selling = InventoryItem.objects.create(user=self.user, name='Hammer', category=category, price='2.00',
+                                                    quantity=40, low_stock_threshold=10)
+        self.idle = InventoryItem.objects.create(user=self.user, name='Anvil', category=category, price='90.00',
+                                                 quantity=3, low_stock_threshold=2)
+        today = bucket_start(timezone.now(), 'DAY')
+        self.daily_sales = {day: (day * 7) % 5 + 1 for day in range(0, self.history_days, 3)}
+        StockMovementRollup.objects.bulk_create([
+            StockMovementRollup(user=self.user, item=self.selling, change_type='SALE', granularity='DAY',
+                                bucket_start=today - timedelta(days=days_ago), quantity=units, change_count=1)
+            for days_ago, units in self.daily_sales.items()
+        ])
+
+    def forecast(self):
+        rows = forecast_demand(self.user.pk, history_days=self.history_days, window_days=self.window_days)
+        return {row['item']: row for row in rows}
+
+    def test_matches_dense_computation(self):
+        sales = np.zeros(self.history_days)
+        for days_ago, units in self.daily_sales.items():
+            sales[self.history_days - 1 - days_ago] = units
+        window = sales[-self.window_days:]
+        weights = 0.3 * 0.7 ** np.arange(self.history_days - 1, -1, -1)
+        ewma = sales @ weights / weights.sum()
+        reorder_point = math.ceil(ewma * 7 + 1.65 * window.std() * math.sqrt(7))
+
+        row = self.forecast()[self.selling.pk]
+        self.assertEqual(row['units_sold'], sum(self.daily_sales.values()))
+        self.assertEqual(row['average_daily_demand'], round(window.mean(), 3))
+        self.assertEqual(row['ewma_daily_demand'], round(ewma, 3))
+        self.assertEqual(row['suggested_reorder_point'], reorder_point)
+
+    def test_items_without_sales_keep_threshold(self):
+        row = self.forecast()[self.idle.pk]
+        self.assertEqual((row['units_sold'], row['suggested_reorder_point']), (0, 2))
+
+        apply_reorder_points(self.user.pk, list(self.forecast().values()))
+        self.idle.refresh_from_db()
+        self.selling.refresh_from_db()
+        self.assertEqual(self.idle.low_stock_threshold, 2)
+        self.assertEqual(self.selling.low_stock_threshold, self.forecast()[self.selling.pk]['suggested_reorder_point'])
+
+    def test_applying_thresholds_moves_low_stock_count(self):
+        suggested = self.forecast()[self.selling.pk]['suggested_reorder_point']
+        InventoryItem.objects.filter(pk=self.selling.pk).update(quantity=suggested)
+        rebuild_summaries([self.user.pk])
+        summary = InventorySummary.objects.get(user=self.user)
+        self.assertEqual(summary.low_stock_count, 0)
+
+        self.assertEqual(apply_reorder_points(self.user.pk, list(self.forecast().values())), 1)
+
+        summary.refresh_from_db()
+        self.assertEqual(summary.low_stock_count, 1)
+        self.assertEqual(verify_summaries([self.user.pk]), [])
+
+    def test_endpoint_pages_items(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        first = client.get('/api/v1/analytics/forecast/?page_size=1').json()
+        second = client.get(first['next']).json()
+
+        self.assertEqual(len(first['results']) + len(second['results']), 2)
+        self.assertIsNone(second['next'])
+        self.assertEqual({first['results'][0]['item'], second['results'][0]['item']}, {self.selling.pk, self.idle.pk})
+
+
+class DatabaseStatsTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', email='admin@example.com', password='pw', is_staff=True)
+        self.client = APIClient()
+
+    def test_reports_requests_and_connection_mode(self):
+        self.client.force_authenticate(self.admin)
+        before = self.client.get('/api/v1/db-stats/').json()
+        self.client.get('/api/v1/db-stats/')
+        after = self.client.get('/api/v1/db-stats/').json()
+
+        self.assertEqual(after['requests'] - before['requests'], 2)
+        default = after['databases'][DEFAULT_DB_ALIAS]
+        self.assertEqual(default['conn_max_age'], connection.settings_dict['CONN_MAX_AGE'])
+        self.assertEqual(default['mode'], 'persistent' if connection.settings_dict['CONN_MAX_AGE'] else 'per-request')
+
+    def test_admin_only(self):
+        user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get('/api/v1/db-stats/').status_code, 403)
+
+
+class RelatedSearchTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.supplier = Supplier.objects.create(user=self.user, name='Northwind Traders', email='orders@northwind.test',
+                                                phone_number='5550199')
+        self.bolt = InventoryItem.objects.create(user=self.user, name='Bolt', category=Category.objects.create(name='Fasteners'),
+                                                 price='0.10', supplier=self.supplier)
+        InventoryItem.objects.create(user=self.user, name='Drill', category=Category.objects.create(name='Power tools'),
+                                     price='80.00')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, path, query):
+        return [row['id'] for row in self.client.get(path, {'search': query}).json()['results']]
+
+    def test_items_match_category_and_supplier_names(self):
+        self.assertEqual(self.search('/api/v1/inventory/user/', 'fasteners'), [self.bolt.pk])
+        self.assertEqual(self.search('/api/v1/inventory/user/', 'northwind'), [self.bolt.pk])
+
+    def test_suppliers_match_phone_number(self):
+        Supplier.objects.create(user=self.user, name='Acme', email='sales@acme.test', phone_number='4440123')
+        self.assertEqual(self.search('/api/v1/suppliers/', '5550199'), [self.supplier.pk])
+
+
+# The report runs its queries on worker threads with their own connections,
+# which only see committed rows
+@override_settings(NOTIFICATIONS={'ASYNC': False})
+class AsyncViewTests(TransactionTestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        category = Category.objects.create(name='Tools')
+        self.items = [
+            InventoryItem.objects.create(user=self.user, name=f'Item {number}', category=category, price='2.00',
+                                         quantity=number * 5, low_stock_threshold=5)
+            for number in range(1, 4)
+        ]
+        other = CustomUser.objects.create_user(username='other', email='other@example.com', password='pw')
+        self.foreign_item = InventoryItem.objects.create(user=other, name='Saw', category=category, price='9.00', quantity=10)
+        self.headers = {'Authorization': f'Bearer {access_token(self.user)}'}
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.headers['Authorization'])
+
+    async def get(self, path, expected_status=200):
+        response = await self.async_client.get(path, headers=self.headers)
+        self.assertEqual(response.status_code, expected_status)
+        return response.json()
+
+    async def sync_get(self, path):
+        return (await sync_to_async(self.client.get)(path)).json()
+
+    async def test_matches_sync_endpoints(self):
+        for async_path, sync_path in [
+            ('/api/v1/async/inventory/user/?page_size=2', '/api/v1/inventory/user/?page_size=2'),
+            ('/api/v1/async/inventory/user/?low_stock=true', '/api/v1/inventory/user/?low_stock=true'),
+            (f'/api/v1/async/inventory/{self.items[0].pk}/', f'/api/v1/inventory/{self.items[0].pk}/'),
+            ('/api/v1/async/inventory-report/', '/api/v1/inventory-report/'),
+        ]:
+            with self.subTest(path=async_path):
+                # Page links differ only by their prefix
+                data = json.loads(json.dumps(await self.get(async_path)).replace('/api/v1/async/', '/api/v1/'))
+                self.assertEqual(data, await self.sync_get(sync_path))
+
+        page = await self.get('/api/v1/async/inventory/user/?page_size=2')
+        self.assertEqual(len(page['results']), 2)
+        self.assertEqual(len((await self.get(page['next']))['results']), 1)
+
+    async def test_other_users_item_is_not_found(self):
+        await self.get(f'/api/v1/async/inventory/{self.foreign_item.pk}/', expected_status=404)
+
+    async def test_requires_token(self):
+        response = await self.async_client.get('/api/v1/async/inventory/user/')
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(
+    DATABASE_REPLICAS={'ALIASES': [TEST_REPLICA], 'MAX_LAG': 2, 'LAG_CHECK_INTERVAL': 0},
+    NOTIFICATIONS={'ASYNC': False},
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    # Committed rows, so the replica connection sees what setUp creates
+    databases = {DEFAULT_DB_ALIAS, TEST_REPLICA}
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.category = Category.objects.create(name='Tools')
+        self.item = InventoryItem.objects.create(user=self.user, name='Hammer', category=self.category, price='2.00', quantity=5)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def request(self, method, path, **kwargs):
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary, \
+                CaptureQueriesContext(connections[TEST_REPLICA]) as replica:
+            response = getattr(self.client, method)(path, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return response, primary.captured_queries, replica.captured_queries
+
+    # Aliases a view would read from before and after it writes
+    def aliases_around_write(self, method):
+        def view(request):
+            before = InventoryItem.objects.all().db
+            Category.objects.create(name=f'Parts {method}')
+            return before, InventoryItem.objects.all().db
+        return ReplicaRoutingMiddleware(view)(getattr(RequestFactory(), method)('/'))
+
+    def test_get_reads_from_replica(self):
+        response, primary, replica = self.request('get', '/api/v1/inventory-changes/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+        self.assertEqual(primary, [])
+        self.assertTrue(replica)
+
+    def test_write_pins_request_to_primary(self):
+        self.assertEqual(self.aliases_around_write('get'), (TEST_REPLICA, DEFAULT_DB_ALIAS))
+        self.assertEqual(self.aliases_around_write('post'), (DEFAULT_DB_ALIAS, DEFAULT_DB_ALIAS))
+
+        response, _, replica = self.request(
+            'post', '/api/v1/inventory-changes/', data={'item': self.item.pk, 'change_type': 'SALE', 'quantity_change': -1},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(replica, [])
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        # Every replica lags by at least 0 seconds
+        with self.settings(DATABASE_REPLICAS={'ALIASES': [TEST_REPLICA], 'MAX_LAG': -1, 'LAG_CHECK_INTERVAL': 0}):
+            response, primary, replica = self.request('get', '/api/v1/inventory-changes/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(replica, [])
+        self.assertTrue(primary)
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(InventoryItem.objects.all().db, DEFAULT_DB_ALIAS)
+
+    def test_export_reads_from_request_replica(self):
+        # The rows are streamed after the middleware has reset the routing state
+        response, primary, replica = self.request('get', '/api/v1/export/inventory/?file_format=csv')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(primary, [])
+        self.assertTrue(any('"inventory_inventoryitem"."name"' in query['sql'] for query in replica))
+
+    def test_cache_miss_reads_from_primary(self):
+        response, primary, replica = self.request('get', '/api/v1/inventory/user/')
+
+        self.assertEqual(response['X-Cache'], 'MISS')
+        # Only the ETag validators may come from the replica, never what gets cached
+        self.assertTrue(all('MAX(' in query['sql'] for query in replica))
+        self.assertTrue(any('"inventory_inventoryitem"."name"' in query['sql'] for query in primary))
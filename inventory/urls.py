@@ -4,11 +4,14 @@ from rest_framework_simplejwt.views import (TokenObtainPairView,
 
 from .views import (CategoryCreateView, CategoryDeleteView, CategoryDetailView,
                     CategoryListView, CategoryUpdateView,
-                    InventoryChangeDetailView, InventoryChangeListCreateView,
-                    InventoryCreateView, InventoryDeleteView,
+                    InventoryChangeBulkCreateView, InventoryChangeDetailView, InventoryChangeListCreateView,
+                    InventoryCreateView, InventoryDeleteView, InventoryImportView, InventoryBulkUpdateView, InventoryBulkDeleteView,
                     InventoryDetailView, InventoryItemListView, InventoryUpdateView,
                     NotificationListView, PasswordChangeView, ProfileUpdateView, UserSupplierListView, SupplierCreateView, SupplierDeleteView, SupplierDetailView, SupplierUpdateView,
-                    UserInventoryListView, InventoryReportView, UserListView, UserInfoView, UserRegistrationView, NotificationUpdateView, NotificationDeleteView)
+                    UserInventoryListView, InventoryReportView, CacheStatsView, DatabaseStatsView, InventoryReportHistoryView, InventorySummaryView, StockMovementSeriesView, ReorderForecastView, UserListView, UserInfoView, UserRegistrationView, NotificationUpdateView, NotificationDeleteView,
+                    NotificationUnreadCountView, NotificationMarkAllReadView, NotificationStreamView,
+                    InventoryExportView, InventoryChangeExportView, SupplierExportView,
+                    AsyncUserInventoryListView, AsyncInventoryDetailView, AsyncInventoryReportView)
 
 urlpatterns = [
     # AUTHENTICATION
@@ -31,6 +34,9 @@ urlpatterns = [
     path('inventory/user/', UserInventoryListView.as_view(), name='user_inventory_list'),
     path('inventory/create/', InventoryCreateView.as_view(), name='inventory_item_create'),
     path('inventories/', InventoryItemListView.as_view(), name='inventory_item_list'),
+    path('inventory/import/', InventoryImportView.as_view(), name='inventory_item_import'),
+    path('inventory/bulk-update/', InventoryBulkUpdateView.as_view(), name='inventory_item_bulk_update'),
+    path('inventory/bulk-delete/', InventoryBulkDeleteView.as_view(), name='inventory_item_bulk_delete'),
     path('inventory/<str:pk>/', InventoryDetailView.as_view(), name='inventory_item_detail'),
     path('inventory/<str:pk>/update/', InventoryUpdateView.as_view(), name='inventory_item_update'),  
     path('inventory/<str:pk>/delete/', InventoryDeleteView.as_view(), name='inventory_item_delete'),
@@ -44,11 +50,33 @@ urlpatterns = [
 
     # INVENTORY CHANGE(HISTORY- Create, Read only)
     path('inventory-changes/', InventoryChangeListCreateView.as_view(), name='inventory_changes_list'),
+    path('inventory-changes/bulk/', InventoryChangeBulkCreateView.as_view(), name='inventory_changes_bulk_create'),
     path('inventory-changes/<str:pk>/', InventoryChangeDetailView.as_view(), name='inventory_change_detail'),
 
     # NOTIFICATIONS
     path('notifications/', NotificationListView.as_view(), name='notification_list'),
+    path('notifications/stream/', NotificationStreamView.as_view(), name='notification_stream'),
+    path('notifications/unread-count/', NotificationUnreadCountView.as_view(), name='notification_unread_count'),
+    path('notifications/mark-all-read/', NotificationMarkAllReadView.as_view(), name='notification_mark_all_read'),
     path('notifications/<str:pk>/', NotificationUpdateView.as_view(), name='notification_update'), 
     path('notifications/<str:pk>/delete/', NotificationDeleteView.as_view(), name='notification_delete'),  
-    path('inventory-report/', InventoryReportView.as_view(), name='inventory_report')
+    path('cache-stats/', CacheStatsView.as_view(), name='cache_stats'),
+    path('db-stats/', DatabaseStatsView.as_view(), name='database_stats'),
+    path('inventory-report/', InventoryReportView.as_view(), name='inventory_report'),
+    path('inventory-summary/', InventorySummaryView.as_view(), name='inventory_summary'),
+    path('inventory-report/history/', InventoryReportHistoryView.as_view(), name='inventory_report_history'),
+
+    # ANALYTICS
+    path('analytics/movements/', StockMovementSeriesView.as_view(), name='stock_movement_series'),
+    path('analytics/forecast/', ReorderForecastView.as_view(), name='reorder_forecast'),
+
+    # EXPORTS
+    path('export/inventory/', InventoryExportView.as_view(), name='inventory_export'),
+    path('export/inventory-changes/', InventoryChangeExportView.as_view(), name='inventory_change_export'),
+    path('export/suppliers/', SupplierExportView.as_view(), name='supplier_export'),
+
+    # ASYNC (ASGI-native read endpoints)
+    path('async/inventory/user/', AsyncUserInventoryListView.as_view(), name='async_user_inventory_list'),
+    path('async/inventory/<str:pk>/', AsyncInventoryDetailView.as_view(), name='async_inventory_item_detail'),
+    path('async/inventory-report/', AsyncInventoryReportView.as_view(), name='async_inventory_report'),
 ]
\ No newline at end of file
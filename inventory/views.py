@@ -1,20 +1,50 @@
+import asyncio
+import json
+from datetime import timedelta
+
 from django.contrib.auth import update_session_auth_hash
-from django.db.models import F
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Max
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views import View
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, status
-from rest_framework.generics import (CreateAPIView, DestroyAPIView,
+from rest_framework.generics import (CreateAPIView, DestroyAPIView, GenericAPIView,
                                      ListAPIView, ListCreateAPIView,
                                      RetrieveAPIView, RetrieveUpdateAPIView, UpdateAPIView)
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import (AllowAny, IsAdminUser, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
 
-from .models import Category, CustomUser, InventoryChange, InventoryItem, Notification, Supplier
-from .serializers import (CategorySerializer, InventoryChangeSerializer,
+from .authentication import TokenClaimsAuthMixin, authenticate_request
+from .concurrency import gather_queries
+from .cache import GLOBAL_SCOPE, TenantCacheMixin, metrics
+from .export import CHANGE_COLUMNS, CONTENT_TYPES, ITEM_COLUMNS, SUPPLIER_COLUMNS, export_response
+from .forecasting import forecast_demand
+from .importer import import_format, import_inventory, read_rows
+from .database import connection_metrics
+from .conditional import ConditionalGetMixin, ConditionalUpdateMixin
+from .models import Category, CustomUser, InventoryChange, InventoryItem, Notification, Profile, StockMovementRollup, Supplier
+from .notifications import adjust_unread_count, mark_all_read, set_read
+from .pagination import ChangeDateKeysetPagination, ItemIdKeysetPagination, NotificationKeysetPagination, UpdatedAtKeysetPagination
+from .pubsub import get_broker, user_channel
+from .serializers import (CategorySerializer, ForecastParamsSerializer, InventoryChangeBulkRowSerializer, InventoryChangeSerializer,
+                          InventoryBulkSelectionSerializer, InventoryBulkUpdateSerializer,
                           InventoryItemSerializer, InventoryItemUpdateSerializer, NotificationSerializer, PasswordChangeSerializer, ProfileSerializer,
                           UserListSerializer, UserRegistrationSerializer, SupplierSerializer)
+from .search import RankedSearchFilter
+from .services import MAX_PRICE, InsufficientStock, bulk_delete_items, bulk_update_items, record_changes_bulk
+from .summary import read_summary
 
 
 #1. USER MODELS VIEWS
@@ -27,7 +57,7 @@ class UserRegistrationView(CreateAPIView):
 
 #1.2 This view lists all users, accessible only by admin users
 class UserListView(ListAPIView):
-    queryset = CustomUser.objects.all()
+    queryset = CustomUser.objects.select_related('profile')
     serializer_class = UserListSerializer
     permission_classes = [IsAdminUser]
 
@@ -36,16 +66,24 @@ class UserInfoView(RetrieveUpdateAPIView):
     serializer_class = UserListSerializer
     permission_classes = [IsAuthenticated]
 
+    # Read fresh, request.user may be a cached copy and saving it would write stale columns back
     def get_object(self):
-        return self.request.user
+        return CustomUser.objects.select_related('profile').get(pk=self.request.user.pk)
 
 #1.4 Profile views to Retrieve and Update Profile
-class ProfileUpdateView(RetrieveUpdateAPIView):
+class ProfileUpdateView(ConditionalGetMixin, ConditionalUpdateMixin, RetrieveUpdateAPIView):
     serializer_class = ProfileSerializer
     permission_classes = [IsAuthenticated]
 
+    # Read fresh, request.user.profile may come from the authentication cache
     def get_object(self):
-        return self.request.user.profile
+        return Profile.objects.get(user=self.request.user)
+
+    def get_validator_queryset(self):
+        return Profile.objects.filter(user=self.request.user)
+
+    def get_validator_key(self, request):
+        return request.user.pk
     
     def patch(self, request, *args, **kwargs):
         return self.partial_update(request, *args, **kwargs)
@@ -55,23 +93,25 @@ class PasswordChangeView(UpdateAPIView):
     serializer_class = PasswordChangeSerializer
     permission_classes = [permissions.IsAuthenticated]
     
+    # Locked fresh row, request.user may be a cached copy and a concurrent change must not be overwritten
     def get_object(self):
-        return self.request.user
+        return CustomUser.objects.select_for_update().get(pk=self.request.user.pk)
     
     def update(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        user = self.get_object()
-        
-        if not user.check_password(serializer.validated_data['old_password']):
-            return Response(
-                {"old_password": ["Wrong password."]}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        user.set_password(serializer.validated_data['new_password'])
-        user.save()
+        with transaction.atomic():
+            user = self.get_object()
+
+            if not user.check_password(serializer.validated_data['old_password']):
+                return Response(
+                    {"old_password": ["Wrong password."]}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            user.set_password(serializer.validated_data['new_password'])
+            user.save(update_fields=['password'])
         
         # Keeps user logged in after password change
         update_session_auth_hash(request, user)
@@ -82,7 +122,8 @@ class PasswordChangeView(UpdateAPIView):
 #2. CATEGORY MODEL VIEWS(create, Update and Delete by admin only)
 
 #2.1 List Categories
-class CategoryListView(ListAPIView):
+class CategoryListView(ConditionalGetMixin, TenantCacheMixin, ListAPIView):
+    cache_scope = GLOBAL_SCOPE
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
@@ -96,13 +137,13 @@ class CategoryCreateView(CreateAPIView):
     permission_classes = [IsAuthenticated]
 
 #2.3 Retrieve Category
-class CategoryDetailView(RetrieveAPIView):
+class CategoryDetailView(ConditionalGetMixin, RetrieveAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
 
 #2.4 Update Category
-class CategoryUpdateView(UpdateAPIView):
+class CategoryUpdateView(ConditionalUpdateMixin, UpdateAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
@@ -117,16 +158,18 @@ class CategoryDeleteView(DestroyAPIView):
 #3. INVENTORY ITEM VIEWS
 
 #3.1 List inventory Items(Admin users see all items, regular users see their own items only)
-class InventoryItemListView(ListAPIView):
-    queryset = InventoryItem.objects.all()
+class InventoryItemListView(ConditionalGetMixin, ListAPIView):
+    queryset = InventoryItem.objects.select_related('user')
     serializer_class = InventoryItemSerializer
     permission_classes = [IsAdminUser]
-    filter_backends = [DjangoFilterBackend]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter]
     filterset_fields = ['name', 'category', 'price', 'quantity', 'created_at', 'updated_at']
-    search_fields = ['name', 'description', 'category__name', 'supplier', 'barcode']
+    # Same columns as item_search_idx / the trigram indexes on InventoryItem, Category and Supplier
+    search_fields = ['name', 'description']
+    search_fuzzy_fields = ['name', 'barcode', 'category__name', 'supplier__name']
     ordering_fields = ['name', 'price', 'quantity', 'created_at', 'updated_at']
     ordering = ['-updated_at']
-    pagination_class = PageNumberPagination
+    pagination_class = UpdatedAtKeysetPagination
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -135,7 +178,7 @@ class InventoryItemListView(ListAPIView):
         low_stock = self.request.query_params.get('low_stock', None)
         if low_stock is not None:
             if low_stock.lower() in ['true', '1', 'yes']:
-                queryset = queryset.filter(quantity__lte=F('low_stock_threshold'))
+                queryset = queryset.low_stock()
         
         return queryset
 
@@ -149,15 +192,15 @@ class InventoryCreateView(CreateAPIView):
         serializer.save(user=self.request.user)
 
 #3.3 Retrieve inventory Item
-class InventoryDetailView(RetrieveAPIView):
+class InventoryDetailView(ConditionalGetMixin, TenantCacheMixin, RetrieveAPIView):
     serializer_class = InventoryItemSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return InventoryItem.objects.filter(user=self.request.user)
+        return InventoryItem.objects.filter(user=self.request.user).select_related('user')
 
 #3.4 Update inventory Item
-class InventoryUpdateView(UpdateAPIView):
+class InventoryUpdateView(ConditionalUpdateMixin, UpdateAPIView):
     serializer_class = InventoryItemUpdateSerializer
     permission_classes = [IsAuthenticated]
 
@@ -173,51 +216,169 @@ class InventoryDeleteView(DestroyAPIView):
         return InventoryItem.objects.filter(user=self.request.user)
     
 #3.6 User Inventory List View
-class UserInventoryListView(ListAPIView):
+class UserInventoryListView(TokenClaimsAuthMixin, ConditionalGetMixin, TenantCacheMixin, ListAPIView):
     serializer_class = InventoryItemSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter]
     filterset_fields = ['name', 'category', 'price', 'quantity', 'created_at', 'updated_at']
-    search_fields = ['name', 'description', 'category__name']
-    pagination_class = PageNumberPagination
+    search_fields = ['name', 'description']
+    search_fuzzy_fields = ['name', 'barcode', 'category__name', 'supplier__name']
+    pagination_class = UpdatedAtKeysetPagination
 
     def get_queryset(self):
-        queryset = InventoryItem.objects.filter(user=self.request.user)
+        queryset = InventoryItem.objects.filter(user_id=self.request.user.pk).select_related('user')
 
         # Low stock filter
         low_stock = self.request.query_params.get('low_stock', None)
         if low_stock is not None:
             if low_stock.lower() in ['true', '1', 'yes']:
-                queryset = queryset.filter(quantity__lte=F('low_stock_threshold'))
+                queryset = queryset.low_stock()
 
         return queryset
 
 
+#3.7 Import Inventory Items (CSV or NDJSON upload, see inventory/importer.py)
+class InventoryImportView(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"file": ["No file was submitted."]}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = import_format(upload.name, request.data.get('file_format'))
+        if file_format is None:
+            return Response({"file_format": ["Upload a .csv or .ndjson file, or set file_format."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        dry_run = str(request.data.get('dry_run', '')).lower() in ['true', '1', 'yes']
+        result = import_inventory(request.user, read_rows(upload, file_format), dry_run=dry_run)
+        result['dry_run'] = dry_run
+
+        if not result['created']:
+            if not result['failed']:
+                result['errors'] = [{"row": None, "errors": {"file": ["The file contains no rows."]}}]
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif dry_run:
+            response_status = status.HTTP_200_OK
+        elif result['failed']:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response(result, status=response_status)
+
+#3.8 Bulk Item Selection (an id list, or the filters of the user inventory list plus supplier and low_stock)
+class InventoryBulkSelectionMixin:
+    permission_classes = [IsAuthenticated]
+    filterset_fields = UserInventoryListView.filterset_fields + ['supplier']
+
+    def get_selection(self, data):
+        items = InventoryItem.objects.filter(user=self.request.user)
+        if 'ids' in data:
+            return items.filter(pk__in=data['ids'])
+
+        filters = dict(data['filter'])
+        if str(filters.pop('low_stock', '')).lower() in ['true', '1', 'yes']:
+            items = items.low_stock()
+        filterset = DjangoFilterBackend().get_filterset_class(self, items)(data=filters, queryset=items, request=self.request)
+        # A misspelt filter must not silently widen the selection to every item
+        unknown = sorted(set(filters) - set(filterset.filters))
+        if unknown:
+            raise ValidationError({"filter": [f"Unknown filter(s): {', '.join(unknown)}."]})
+        if not filterset.is_valid():
+            raise ValidationError({"filter": filterset.errors})
+        return filterset.qs
+
+#3.9 Bulk Update Inventory Items (one UPDATE for the whole selection)
+class InventoryBulkUpdateView(InventoryBulkSelectionMixin, APIView):
+    def post(self, request):
+        serializer = InventoryBulkUpdateSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        items = self.get_selection(serializer.validated_data)
+        patch = serializer.validated_data['patch']
+
+        if 'price_multiplier' in patch:
+            highest = items.aggregate(highest=Max('price'))['highest']
+            if highest is not None and highest * patch['price_multiplier'] >= MAX_PRICE:
+                raise ValidationError({"patch": {"price_multiplier": ["Some prices would exceed the maximum price."]}})
+
+        return Response({"updated": bulk_update_items(request.user.pk, items, patch)})
+
+#3.10 Bulk Delete Inventory Items (one DELETE for the whole selection)
+class InventoryBulkDeleteView(InventoryBulkSelectionMixin, APIView):
+    def post(self, request):
+        serializer = InventoryBulkSelectionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        deleted, changes = bulk_delete_items(request.user.pk, self.get_selection(serializer.validated_data))
+        return Response({"deleted": deleted, "changes_deleted": changes})
+
 #4. INVENTORY CHANGE VIEWS
 
 #4.1 List and Create Inventory Changes
 class InventoryChangeListCreateView(ListCreateAPIView):
     serializer_class = InventoryChangeSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter]
     filterset_fields = ['change_type', 'change_date', 'item__name', 'user__username']
-    search_fields = ['item__name', 'reason', 'user__username']
+    search_fields = ['reason']
+    search_fuzzy_fields = ['item__name']
     ordering_fields = ['change_date', 'change_type', 'quantity_change']
-    pagination_class = PageNumberPagination
+    pagination_class = ChangeDateKeysetPagination
     
     def get_queryset(self):
-        return InventoryChange.objects.filter(item__user=self.request.user).select_related('item', 'user')
+        return InventoryChange.objects.filter(user=self.request.user).select_related('item', 'user')
     
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        # Stock is checked again inside the UPDATE, a concurrent sale may have won the race
+        try:
+            serializer.save(user=self.request.user)
+        except InsufficientStock as exc:
+            raise ValidationError({"quantity_change": exc.messages})
         
-#4.2 Retrieve Inventory Change Details
+#4.2 Bulk Create Inventory Changes (e.g. point-of-sale batch uploads)
+class InventoryChangeBulkCreateView(APIView):
+    permission_classes = [IsAuthenticated]
+    max_rows = 5000
+
+    def post(self, request):
+        rows = request.data.get('changes') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({"changes": ["Expected a non-empty list of changes."]}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > self.max_rows:
+            return Response({"changes": [f"At most {self.max_rows} changes can be posted at once."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(rows)
+        valid_rows = []
+        for index, row in enumerate(rows):
+            serializer = InventoryChangeBulkRowSerializer(data=row)
+            if serializer.is_valid():
+                valid_rows.append((index, serializer.validated_data))
+            else:
+                results[index] = {"index": index, "status": "error", "errors": serializer.errors}
+
+        if valid_rows:
+            for result in record_changes_bulk(request.user, valid_rows):
+                results[result['index']] = result
+
+        created = sum(1 for result in results if result['status'] == 'created')
+        if created == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+
+        return Response(
+            {"created": created, "failed": len(results) - created, "results": results},
+            status=response_status,
+        )
+
+#4.3 Retrieve Inventory Change Details
 class InventoryChangeDetailView(RetrieveAPIView):
     serializer_class = InventoryChangeSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return InventoryChange.objects.filter(item__user=self.request.user)
+        return InventoryChange.objects.filter(user=self.request.user).select_related('item', 'user')
 
 # Update and Delete Inventory Change (if needed, usually changes are not updated or deleted)
 # I don't recommend allowing updates or deletions of inventory changes for audit purposes
@@ -248,22 +409,23 @@ class SupplierCreateView(CreateAPIView):
         serializer.save(user=self.request.user)
 
 #5.2 List Suppliers
-class UserSupplierListView(ListAPIView):
+class UserSupplierListView(ConditionalGetMixin, TenantCacheMixin, ListAPIView):
     queryset = Supplier.objects.all()
     serializer_class = SupplierSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter]
     filterset_fields = ['name', 'contact_person', 'email', 'phone_number', 'city', 'state', 'country', 'created_at', 'updated_at']
-    search_fields = ['name', 'contact_person', 'email', 'phone_number']
+    search_fields = ['name', 'contact_person']
+    search_fuzzy_fields = ['name', 'email', 'phone_number']
     ordering_fields = ['name', 'created_at', 'updated_at']
     ordering = ['-updated_at']
-    pagination_class = PageNumberPagination
+    pagination_class = UpdatedAtKeysetPagination
 
     def get_queryset(self):
         return Supplier.objects.filter(user=self.request.user)
 
 #5.3 Retrieve Supplier Details
-class SupplierDetailView(RetrieveAPIView):
+class SupplierDetailView(ConditionalGetMixin, RetrieveAPIView):
     serializer_class = SupplierSerializer
     permission_classes = [IsAuthenticated]
 
@@ -271,7 +433,7 @@ class SupplierDetailView(RetrieveAPIView):
         return Supplier.objects.filter(user=self.request.user)
 
 #5.4 Update Supplier Details
-class SupplierUpdateView(UpdateAPIView):
+class SupplierUpdateView(ConditionalUpdateMixin, UpdateAPIView):
     serializer_class = SupplierSerializer
     permission_classes = [IsAuthenticated]
 
@@ -287,16 +449,51 @@ class SupplierDeleteView(DestroyAPIView):
         return Supplier.objects.filter(user=self.request.user)
 
 
+#5.6 Cache Hit/Miss Statistics (per process)
+class CacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(metrics.snapshot())
+
+#5.7 Database Connection Statistics (per process: reuse, and pool usage when pooling is on)
+class DatabaseStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(connection_metrics.snapshot())
+
+
 #6. NOTIFICATION VIEWS
 
 #6.1 Notification List View
-class NotificationListView(ListAPIView):
+# ?since=<created_at of the newest notification seen> returns only newer ones for polling,
+# ?unread=true only the unread ones
+class NotificationListView(TokenClaimsAuthMixin, ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
-    # pagination_class = PageNumberPagination
+    pagination_class = NotificationKeysetPagination
 
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        queryset = Notification.objects.filter(user_id=self.request.user.pk).order_by('-created_at')
+
+        since = self.request.query_params.get('since')
+        if since:
+            try:
+                since = parse_datetime(since)
+            except ValueError:
+                since = None
+            if since is None:
+                raise ValidationError({"since": ["Expected an ISO 8601 datetime."]})
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            queryset = queryset.filter(created_at__gt=since)
+
+        unread = self.request.query_params.get('unread')
+        if unread is not None and unread.lower() in ['true', '1', 'yes']:
+            queryset = queryset.filter(is_read=False)
+
+        return queryset
 
 #6.2 Notification Update View (e.g., mark as read)
 class NotificationUpdateView(UpdateAPIView):
@@ -306,6 +503,17 @@ class NotificationUpdateView(UpdateAPIView):
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user)
 
+    def perform_update(self, serializer):
+        notification = serializer.instance
+        is_read = serializer.validated_data.pop('is_read', None)
+        if is_read is not None:
+            set_read(notification, is_read)
+        # The other fields are saved on their own, a full save could undo a concurrent read flip
+        if serializer.validated_data:
+            for attr, value in serializer.validated_data.items():
+                setattr(notification, attr, value)
+            notification.save(update_fields=list(serializer.validated_data))
+
 #6.3 Notification Delete View
 class NotificationDeleteView(DestroyAPIView):
     serializer_class = NotificationSerializer
@@ -314,43 +522,322 @@ class NotificationDeleteView(DestroyAPIView):
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # Whether it was still unread is decided by the DELETE itself, not the loaded row
+            unread = Notification.objects.filter(pk=instance.pk, is_read=False).delete()[0]
+            if unread:
+                adjust_unread_count(self.request.user.pk, -1)
+            else:
+                instance.delete()
+
+#6.4 Unread Notification Count (read from the counter on the profile)
+class NotificationUnreadCountView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        count = Profile.objects.filter(user=request.user).values_list('unread_notifications', flat=True).first()
+        return Response({"unread_count": count or 0})
+
+#6.5 Mark All Notifications As Read
+class NotificationMarkAllReadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        return Response({"updated": mark_all_read(request.user.pk)})
+
+
+#6.6 Notification Stream (Server-Sent Events, served by the ASGI application)
+# Pushes new notifications and stock level changes as they happen. Browsers' EventSource
+# can't set headers, so the access token may also be passed as ?token=
+class NotificationStreamView(View):
+    keepalive_interval = 15
+
+    async def get(self, request):
+        # Under WSGI the endless stream would be read into memory and hold a worker forever
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({"detail": "The notification stream is only served by the ASGI application."}, status=501)
+
+        user = await authenticate_request(request, allow_query_token=True)
+        if user is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided or are invalid."}, status=401)
+
+        subscription = get_broker().subscribe(user_channel(user.pk))
+
+        async def stream():
+            try:
+                yield "retry: 3000\n\n"
+                while True:
+                    try:
+                        event = await subscription.get(timeout=self.keepalive_interval)
+                    except asyncio.TimeoutError:
+                        yield ": keepalive\n\n"
+                        continue
+                    yield f"event: {event['type']}\ndata: {json.dumps(event['data'], cls=DjangoJSONEncoder)}\n\n"
+            finally:
+                subscription.close()
+
+        response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
 
 #7. INVENTORY REPORT VIEW
-class InventoryReportView(APIView):
+# The report's three independent reads, run one after the other here and concurrently by the async view
+def inventory_report_queries(user_id):
+    items = InventoryItem.objects.filter(user_id=user_id)
+    line_value = ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField(max_digits=20, decimal_places=2))
+    return (
+        # Totals come from the maintained summary tables instead of scanning the items
+        lambda: read_summary(user_id),
+        lambda: list(items.low_stock().values_list('name', flat=True)),
+        lambda: list(items.annotate(line_value=line_value).values('name', 'category__name', 'quantity', 'price', 'line_value')),
+    )
+
+def build_inventory_report(request, summary, low_stock, stock_levels):
+    return {
+        "total_inventory_value": summary['total_inventory_value'],
+        "total_items_in_stock": summary['total_items_in_stock'],
+        "low_stock_count": summary['low_stock_count'],
+        "low_stock_items": low_stock,
+        "category_totals": summary['category_totals'],
+        "stock_levels": [
+            {
+                "name": row['name'],
+                "category": row['category__name'],
+                "quantity": row['quantity'],
+                "unit_price": row['price'],
+                "total_value": row['line_value']
+            } for row in stock_levels
+        ],
+        # The full history is streamed from its own endpoint
+        "change_history_url": request.build_absolute_uri(reverse('inventory_report_history')),
+    }
+
+class InventoryReportView(TokenClaimsAuthMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        summary, low_stock, stock_levels = (query() for query in inventory_report_queries(request.user.pk))
+        return Response(build_inventory_report(request, summary, low_stock, stock_levels))
+
+
+#7.1 INVENTORY SUMMARY (dashboard totals only, constant time)
+class InventorySummaryView(TokenClaimsAuthMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        items = InventoryItem.objects.filter(user=user)
-        changes = InventoryChange.objects.filter(user=user).order_by('-change_date')
-
-        total_value = sum(item.quantity * item.price for item in items)
-        low_stock = items.filter(quantity__lte=F('low_stock_threshold'))
-
-        report = {
-            "total_inventory_value": total_value,
-            "total_items_in_stock": items.count(),
-            "low_stock_items": [item.name for item in low_stock],
-            "stock_levels": [
+        return Response(read_summary(request.user.pk))
+
+
+# Optional ?start= / ?end= range on a datetime field, e.g. ?start=2025-01-01&end=2025-01-31T12:00:00.
+# Dates include the whole day.
+def filter_by_date_range(request, queryset, field):
+    for param, lookup in (('start', 'gte'), ('end', 'lte')):
+        value = request.query_params.get(param)
+        if not value:
+            continue
+        try:
+            day = parse_date(value)
+            moment = None if day else parse_datetime(value)
+        except ValueError:
+            day = moment = None
+        if day:
+            queryset = queryset.filter(**{f'{field}__date__{lookup}': day})
+        elif moment:
+            if timezone.is_naive(moment):
+                moment = timezone.make_aware(moment)
+            queryset = queryset.filter(**{f'{field}__{lookup}': moment})
+        else:
+            raise ValidationError({param: ["Expected an ISO 8601 date or datetime."]})
+    return queryset
+
+
+#7.2 INVENTORY CHANGE HISTORY (streamed as NDJSON, one change per line)
+class InventoryReportHistoryView(APIView):
+    permission_classes = [IsAuthenticated]
+    chunk_size = 2000
+
+    def get(self, request):
+        changes = InventoryChange.objects.filter(user=request.user).order_by('-change_date')
+
+        changes = filter_by_date_range(request, changes, 'change_date')
+
+        rows = changes.values(
+            'change_date', 'item__name', 'change_type', 'quantity_change', 'previous_quantity', 'new_quantity', 'reason'
+        ).iterator(chunk_size=self.chunk_size)
+
+        def stream():
+            for change in rows:
+                yield json.dumps({
+                    "date": change['change_date'],
+                    "item": change['item__name'],
+                    "type": change['change_type'],
+                    "quantity": change['quantity_change'],
+                    "from": change['previous_quantity'],
+                    "to": change['new_quantity'],
+                    "reason": change['reason']
+                }, cls=DjangoJSONEncoder) + "\n"
+
+        return StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+
+
+#8. ANALYTICS
+
+#8.1 Stock Movement Time Series (read from the hourly/daily rollups, not the change log)
+# ?granularity=day|hour, ?change_type=SALE,RETURN, ?item=<id>, ?start=&end= (last 90 days by default)
+class StockMovementSeriesView(APIView):
+    permission_classes = [IsAuthenticated]
+    default_days = 90
+
+    def get(self, request):
+        granularity = request.query_params.get('granularity', 'day').upper()
+        if granularity not in dict(StockMovementRollup.GRANULARITY):
+            raise ValidationError({"granularity": ["Expected 'hour' or 'day'."]})
+
+        item_id = request.query_params.get('item')
+        rollups = StockMovementRollup.objects.filter(user=request.user, granularity=granularity)
+        rollups = rollups.filter(item_id=item_id) if item_id else rollups.filter(item__isnull=True)
+
+        change_types = request.query_params.get('change_type')
+        if change_types:
+            change_types = [change_type.strip().upper() for change_type in change_types.split(',')]
+            unknown = set(change_types) - set(dict(InventoryChange.CHANGE_TYPE))
+            if unknown:
+                raise ValidationError({"change_type": [f"Unknown change type(s): {', '.join(sorted(unknown))}."]})
+            rollups = rollups.filter(change_type__in=change_types)
+
+        if 'start' not in request.query_params:
+            rollups = rollups.filter(bucket_start__gte=timezone.now() - timedelta(days=self.default_days))
+        rollups = filter_by_date_range(request, rollups, 'bucket_start')
+
+        series = rollups.order_by('bucket_start', 'change_type').values('bucket_start', 'change_type', 'quantity', 'change_count')
+        return Response({
+            "granularity": granularity.lower(),
+            "item": item_id,
+            "series": [
                 {
-                    "name": item.name,
-                    "category": item.category.name,
-                    "quantity": item.quantity,
-                    "unit_price": item.price,
-                    "total_value": item.quantity * item.price
-                } for item in items
+                    "bucket": row['bucket_start'],
+                    "change_type": row['change_type'],
+                    "quantity": row['quantity'],
+                    "changes": row['change_count'],
+                } for row in series
             ],
-            "change_history": [
-                {
-                    "date": change.change_date,
-                    "item": change.item.name,
-                    "type": change.change_type,
-                    "quantity": change.quantity_change,
-                    "from": change.previous_quantity,
-                    "to": change.new_quantity,
-                    "reason": change.reason
-                } for change in changes
-            ]
-        }
-
-        return Response(report)
\ No newline at end of file
+        })
+
+#8.2 Reorder Point Forecast (demand, days of cover and suggested thresholds, one page of items at a time)
+class ReorderForecastView(APIView):
+    permission_classes = [IsAuthenticated]
+    # One page of items per request keeps the work per request bounded
+    pagination_class = ItemIdKeysetPagination
+
+    def get(self, request):
+        params = ForecastParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        paginator = self.pagination_class()
+        items = paginator.paginate_queryset(
+            InventoryItem.objects.filter(user_id=request.user.pk).only('id', 'name', 'quantity', 'low_stock_threshold'),
+            request,
+            view=self,
+        )
+        rows = forecast_demand(request.user.pk, items=items, **params.validated_data)
+        return Response({"parameters": params.validated_data, **paginator.get_paginated_data(rows)})
+
+
+#9. EXPORTS (streamed CSV or NDJSON, ?file_format=csv|ndjson, same filters as the list views)
+
+#9.1 Base Export View
+class ExportView(GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    export_columns = ()
+    export_name = 'export'
+
+    def get(self, request):
+        file_format = request.query_params.get('file_format', 'csv').lower()
+        if file_format not in CONTENT_TYPES:
+            raise ValidationError({"file_format": ["Expected 'csv' or 'ndjson'."]})
+        queryset = self.filter_queryset(self.get_queryset())
+        return export_response(queryset, self.export_columns, file_format, self.export_name)
+
+#9.2 Export Inventory Items
+class InventoryExportView(ExportView):
+    filterset_fields = UserInventoryListView.filterset_fields
+    export_columns = ITEM_COLUMNS
+    export_name = 'inventory'
+
+    def get_queryset(self):
+        queryset = InventoryItem.objects.filter(user=self.request.user).order_by('-updated_at', '-id')
+        low_stock = self.request.query_params.get('low_stock', None)
+        if low_stock is not None and low_stock.lower() in ['true', '1', 'yes']:
+            queryset = queryset.low_stock()
+        return queryset
+
+#9.3 Export Inventory Changes
+class InventoryChangeExportView(ExportView):
+    filterset_fields = InventoryChangeListCreateView.filterset_fields
+    export_columns = CHANGE_COLUMNS
+    export_name = 'inventory-changes'
+
+    def get_queryset(self):
+        return InventoryChange.objects.filter(user=self.request.user).order_by('-change_date', '-id')
+
+#9.4 Export Suppliers
+class SupplierExportView(ExportView):
+    filterset_fields = UserSupplierListView.filterset_fields
+    export_columns = SUPPLIER_COLUMNS
+    export_name = 'suppliers'
+
+    def get_queryset(self):
+        return Supplier.objects.filter(user=self.request.user).order_by('-updated_at', '-id')
+
+
+#10. ASYNC VIEWS (served natively by the ASGI application, no worker thread per request)
+
+#10.1 Base Async View (JWT authentication and JSON responses without the DRF request cycle)
+class AsyncAPIView(View):
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await authenticate_request(request)
+        if request.user is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided or are invalid."}, status=401)
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            return self.respond({"detail": exc.detail}, status=exc.status_code)
+
+    def respond(self, data, status=200):
+        return JsonResponse(data, status=status, encoder=JSONEncoder)
+
+#10.2 Async User Inventory List (?category=, ?low_stock=, same keyset pagination as #3.6)
+class AsyncUserInventoryListView(AsyncAPIView):
+    async def get(self, request):
+        queryset = InventoryItem.objects.filter(user_id=request.user.pk).select_related('user')
+        if request.GET.get('category'):
+            queryset = queryset.filter(category_id=request.GET['category'])
+        if request.GET.get('low_stock', '').lower() in ['true', '1', 'yes']:
+            queryset = queryset.low_stock()
+
+        paginator = UpdatedAtKeysetPagination()
+        count_queryset, page_queryset = paginator.prepare(queryset, Request(request))
+        count, page = await gather_queries(
+            count_queryset.count if count_queryset is not None else (lambda: None),
+            lambda: list(page_queryset),
+        )
+        page = paginator.set_page(page, count)
+        return self.respond(paginator.get_paginated_data(InventoryItemSerializer(page, many=True).data))
+
+#10.3 Async Inventory Item Detail
+class AsyncInventoryDetailView(AsyncAPIView):
+    async def get(self, request, pk):
+        try:
+            item = await InventoryItem.objects.select_related('user').aget(pk=pk, user_id=request.user.pk)
+        except InventoryItem.DoesNotExist:
+            return self.respond({"detail": "No InventoryItem matches the given query."}, status=404)
+        return self.respond(InventoryItemSerializer(item).data)
+
+#10.4 Async Inventory Report (summary, low stock and stock levels read concurrently)
+class AsyncInventoryReportView(AsyncAPIView):
+    async def get(self, request):
+        summary, low_stock, stock_levels = await gather_queries(*inventory_report_queries(request.user.pk))
+        return self.respond(build_inventory_report(request, summary, low_stock, stock_levels))
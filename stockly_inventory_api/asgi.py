@@ -12,5 +12,10 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stockly_inventory_api.settings')
+# Read by settings to turn persistent connections off by default (see DB_POOL there)
+os.environ.setdefault('DJANGO_ASGI', 'True')
 
+# Serve with an ASGI server (e.g. uvicorn/daphne) so the live notification stream
+# at /api/v1/notifications/stream/ and the /api/v1/async/ read endpoints run on the
+# event loop instead of holding a worker thread
 application = get_asgi_application()
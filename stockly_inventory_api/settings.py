@@ -12,7 +12,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta
-from decouple import config
+from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # LOCAL APPS
     'inventory',
@@ -58,6 +60,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'inventory.routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.common.CommonMiddleware',
@@ -105,6 +108,20 @@ WSGI_APPLICATION = 'stockly_inventory_api.wsgi.application'
 # }
 
 
+# Connections are kept open for DB_CONN_MAX_AGE seconds (0 closes them after every request)
+# and checked before reuse. DB_POOL=True uses Django's connection pool instead, which needs
+# psycopg 3 with psycopg_pool (psycopg[binary,pool], in requirements.txt).
+# Under ASGI (asgi.py sets DJANGO_ASGI) persistent connections are off by default, as Django
+# recommends there: each request and each gather_queries thread would otherwise hold its own
+# connection open. Use DB_POOL=True to reuse connections when serving with ASGI.
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+if DB_POOL:
+    try:
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        raise ImproperlyConfigured("DB_POOL=True needs psycopg 3 with its pool: pip install 'psycopg[binary,pool]'.")
+SERVING_ASGI = config('DJANGO_ASGI', default=False, cast=bool)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -113,14 +130,57 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST'),
         'PORT': config('DB_PORT'),
+        # Pooled connections are returned to the pool, not kept per thread
+        'CONN_MAX_AGE': 0 if DB_POOL else config('DB_CONN_MAX_AGE', default=0 if SERVING_ASGI else 60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        'OPTIONS': {
+            'pool': {
+                'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+                'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+                'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+                'max_idle': config('DB_POOL_MAX_IDLE', default=300, cast=float),
+            },
+        } if DB_POOL else {},
+    }
+}
+
+# Read replicas: DB_REPLICA_HOSTS=host1,host2 adds the aliases replica1, replica2, ... with the
+# primary's credentials. Reads made while serving a request go to a replica unless it lags more
+# than DB_REPLICA_MAX_LAG seconds, or the request has already written (then the primary is used).
+DB_REPLICA_HOSTS = config('DB_REPLICA_HOSTS', default='', cast=Csv())
+for number, host in enumerate(DB_REPLICA_HOSTS, start=1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['inventory.routers.ReplicaRouter']
+DATABASE_REPLICAS = {
+    'ALIASES': [f'replica{number}' for number in range(1, len(DB_REPLICA_HOSTS) + 1)],
+    'MAX_LAG': config('DB_REPLICA_MAX_LAG', default=2, cast=float),
+    'LAG_CHECK_INTERVAL': config('DB_REPLICA_LAG_CHECK_INTERVAL', default=5, cast=float),
+}
+
+# Cache
+# Local memory by default, point CACHE_BACKEND/CACHE_LOCATION at a shared cache (e.g. Redis) in production
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='stockly'),
     }
 }
 
+# Per-user cache of serialized inventory lists and details, invalidated on every write
+INVENTORY_CACHE_ALIAS = 'default'
+INVENTORY_CACHE_TIMEOUT = config('INVENTORY_CACHE_TIMEOUT', default=300, cast=int)
+
 # Rest Framework and JWT configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
 
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'inventory.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
@@ -128,6 +188,36 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 100
 }
 
+# Notifications raised by stock changes are batched and written by a background thread.
+# A low-stock alert is sent at most once per item per LOW_STOCK_ALERT_WINDOW seconds.
+NOTIFICATIONS = {
+    'ASYNC': config('NOTIFICATIONS_ASYNC', default=True, cast=bool),
+    'FLUSH_INTERVAL': config('NOTIFICATIONS_FLUSH_INTERVAL', default=0.5, cast=float),
+    'BATCH_SIZE': 500,
+    'LOW_STOCK_ALERT_WINDOW': config('LOW_STOCK_ALERT_WINDOW', default=3600, cast=int),
+}
+
+# Broker behind the live notification stream. The default only reaches clients connected
+# to the same process, run a shared broker when serving with several ASGI workers.
+PUBSUB_BACKEND = config('PUBSUB_BACKEND', default='inventory.pubsub.LocalBroker')
+
+# Authenticated users and their profile are cached for TTL seconds (per process, LRU).
+# Turn SHARED on with a shared INVENTORY_CACHE_ALIAS so saves invalidate every worker.
+AUTH_USER_CACHE = {
+    'TTL': config('AUTH_USER_CACHE_TTL', default=30, cast=int),
+    'MAX_ENTRIES': config('AUTH_USER_CACHE_MAX_ENTRIES', default=10000, cast=int),
+    'SHARED': config('AUTH_USER_CACHE_SHARED', default=False, cast=bool),
+}
+
+# Hot read-only endpoints (user inventory list, notifications, report, summary) take the user
+# straight from the token claims without loading it. A deactivated or deleted user then
+# keeps read access to those endpoints until the access token expires.
+TOKEN_CLAIMS_AUTH = config('TOKEN_CLAIMS_AUTH', default=False, cast=bool)
+
+# Backend behind ?search= on the list views. inventory.search.LocalSearchBackend needs no
+# Postgres (tests, SQLite), the default relies on the GIN / pg_trgm indexes.
+SEARCH_BACKEND = config('SEARCH_BACKEND', default='inventory.search.PostgresSearchBackend')
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -303,7 +393,8 @@ SIMPLE_JWT = {
     # "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
     # "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
 
-    # "TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainPairSerializer",
+    # Adds is_staff to the tokens, read by the claims-only authentication (TOKEN_CLAIMS_AUTH)
+    "TOKEN_OBTAIN_SERIALIZER": "inventory.serializers.TokenObtainPairWithClaimsSerializer",
     # "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
     # "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
     # "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",